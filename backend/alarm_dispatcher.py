@@ -0,0 +1,223 @@
+"""
+报警副作用分发模块
+检测线程只做报警判断（防抖、去重），把报警事件交给分发器后立即返回；保存报警截图、录制事件视频、
+发送MQTT消息、WebSocket推送等副作用由各自的接收端（sink）在工作线程池中异步执行：
+- 每个接收端有独立的有界队列和并发上限（例如事件视频最多同时录制2路，MQTT和WebSocket按顺序逐条发送）
+- 队列满时按接收端的溢出策略处理：drop_oldest 丢弃最旧的事件，drop_newest 丢弃新事件，
+  block 最多等待 block_timeout 秒（仍然没有空位时丢弃新事件）
+- 某个接收端变慢或出错只影响它自己的队列，不影响检测线程和其他接收端
+"""
+import threading
+import time
+from collections import deque
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+# 接收端的默认配置
+DEFAULT_SINK_CONFIG = {
+    "concurrency": 1,  # 最多同时执行的事件数
+    "queue_size": 64,  # 等待执行的事件数上限
+    "overflow": "drop_oldest",  # 队列满时的处理方式
+    "block_timeout": 0.05  # block 策略最多等待的时间（秒）
+}
+
+
+def normalize_sink_config(config=None, defaults=None):
+    """合并默认值并校验接收端配置，非法值抛出 ValueError"""
+    merged = dict(defaults or DEFAULT_SINK_CONFIG)
+    if config:
+        merged.update({k: v for k, v in config.items() if k in DEFAULT_SINK_CONFIG})
+
+    merged["concurrency"] = int(merged["concurrency"])
+    if not 1 <= merged["concurrency"] <= 32:
+        raise ValueError("concurrency 必须在1-32之间")
+    merged["queue_size"] = int(merged["queue_size"])
+    if not 1 <= merged["queue_size"] <= 10000:
+        raise ValueError("queue_size 必须在1-10000之间")
+    if merged["overflow"] not in OVERFLOW_POLICIES:
+        raise ValueError(f"不支持的溢出策略: {merged['overflow']}，可选: {', '.join(OVERFLOW_POLICIES)}")
+    merged["block_timeout"] = float(merged["block_timeout"])
+    if not 0 <= merged["block_timeout"] <= 5:
+        raise ValueError("block_timeout 必须在0-5秒之间")
+    return merged
+
+
+class AlarmSink:
+    """一个报警副作用接收端（处理函数、队列和统计）"""
+
+    def __init__(self, name, handler, config):
+        self.name = name
+        self.handler = handler  # 处理函数，参数为报警事件
+        self.config = config
+        self.queue = deque()  # [(报警事件, 入队时间)]
+        self.running = 0  # 正在执行的事件数
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def has_capacity(self):
+        """是否还能开始执行新的事件"""
+        return self.running < self.config["concurrency"]
+
+    def stats(self):
+        return dict(self.config, queued=len(self.queue), running=self.running, submitted=self.submitted,
+                    completed=self.completed, failed=self.failed, dropped=self.dropped)
+
+
+class AlarmDispatcher:
+    """报警副作用分发器：各接收端有界队列 + 共享的工作线程池
+
+    on_complete(接收端名称, 耗时秒数, 是否成功) 在每个事件执行完成后调用（用于统计）；
+    on_drop(接收端名称, 报警事件) 在事件因队列满被丢弃时调用（包括 drop_oldest 挤掉的旧事件，在锁外调用）。
+    """
+
+    def __init__(self, workers=4, logger=None, on_complete=None, on_drop=None):
+        self.workers = max(1, int(workers))
+        self.logger = logger
+        self.on_complete = on_complete
+        self.on_drop = on_drop
+        self._cond = threading.Condition()
+        self._sinks = {}  # {名称: AlarmSink}，按注册顺序轮流取事件
+        self._next_sink = 0  # 下一次优先查看的接收端（轮转，避免某个接收端独占工作线程）
+        self._threads = {}  # {线程序号: Thread}
+        self._stop_event = None
+
+    def register(self, name, handler, config=None):
+        """注册接收端（config 为接收端配置，缺省项使用默认值）"""
+        with self._cond:
+            self._sinks[name] = AlarmSink(name, handler, normalize_sink_config(config))
+
+    def configure(self, workers=None, sinks=None):
+        """修改工作线程数和接收端配置（sinks 为 {名称: 配置}，只修改给出的项），非法值抛出 ValueError"""
+        dropped = []
+        with self._cond:
+            updates = {name: normalize_sink_config(config, self._sinks[name].config)
+                       for name, config in (sinks or {}).items() if name in self._sinks}
+            for name, config in updates.items():
+                sink = self._sinks[name]
+                sink.config = config
+                # 缩小队列时丢弃最旧的事件
+                while len(sink.queue) > config["queue_size"]:
+                    self._drop(sink, sink.queue.popleft()[0], dropped)
+            if workers is not None:
+                self.workers = max(1, int(workers))
+            self._cond.notify_all()
+        self._report_drops(dropped)
+        if self._stop_event is not None:
+            self._spawn_workers()
+
+    def start(self, stop_event):
+        """启动工作线程"""
+        self._stop_event = stop_event
+        self._spawn_workers()
+
+    def _spawn_workers(self):
+        """按序号补足工作线程（序号不小于线程数的线程在空闲时退出）"""
+        with self._cond:
+            self._threads = {index: thread for index, thread in self._threads.items() if thread.is_alive()}
+            for index in range(self.workers):
+                if index in self._threads:
+                    continue
+                thread = threading.Thread(target=self._run, args=(index,), name=f"alarm-dispatch-{index}", daemon=True)
+                self._threads[index] = thread
+                thread.start()
+
+    def submit(self, event, sinks):
+        """把报警事件交给指定的接收端（不等待执行），返回这个事件因队列满被丢弃的接收端名称"""
+        dropped = []  # [(接收端名称, 被丢弃的事件)]
+        with self._cond:
+            for name in sinks:
+                sink = self._sinks.get(name)
+                if sink is None:
+                    continue
+                sink.submitted += 1
+                self._enqueue(sink, event, dropped)
+            self._cond.notify_all()
+        self._report_drops(dropped)
+        return [name for name, dropped_event in dropped if dropped_event is event]
+
+    def _enqueue(self, sink, event, dropped):
+        """按溢出策略放入队列，被丢弃的事件记入 dropped（调用时持有锁）"""
+        config = sink.config
+        if len(sink.queue) >= config["queue_size"] and config["overflow"] == "block":
+            self._cond.wait_for(lambda: len(sink.queue) < sink.config["queue_size"], config["block_timeout"])
+        if len(sink.queue) >= config["queue_size"]:
+            if config["overflow"] != "drop_oldest":
+                self._drop(sink, event, dropped)
+                return
+            self._drop(sink, sink.queue.popleft()[0], dropped)
+        sink.queue.append((event, time.monotonic()))
+
+    def _drop(self, sink, event, dropped):
+        sink.dropped += 1
+        dropped.append((sink.name, event))
+
+    def _report_drops(self, dropped):
+        """记录日志并调用 on_drop（不持有锁）"""
+        if not dropped:
+            return
+        if self.logger:
+            self.logger.warning(f"报警处理队列已满，已丢弃: {', '.join(name for name, _ in dropped)}")
+        if self.on_drop is not None:
+            for name, event in dropped:
+                self.on_drop(name, event)
+
+    def _take(self):
+        """取出下一个可以执行的事件（轮转查看各接收端，跳过已达并发上限的），没有时返回None"""
+        sinks = list(self._sinks.values())
+        for offset in range(len(sinks)):
+            sink = sinks[(self._next_sink + offset) % len(sinks)]
+            if sink.queue and sink.has_capacity():
+                self._next_sink = (self._next_sink + offset + 1) % len(sinks)
+                event, _ = sink.queue.popleft()
+                sink.running += 1
+                self._cond.notify_all()  # 唤醒等待空位的 block 策略提交者
+                return sink, event
+        return None
+
+    def _run(self, index):
+        """工作线程主循环"""
+        while not self._stop_event.is_set():
+            with self._cond:
+                if index >= self.workers:
+                    # 在持有锁时移除自己，之后增加线程数时会重新启动这个序号
+                    if self._threads.get(index) is threading.current_thread():
+                        del self._threads[index]
+                    return
+                job = self._take()
+                if job is None:
+                    self._cond.wait(0.5)
+                    continue
+            sink, event = job
+            start = time.perf_counter()
+            success = True
+            try:
+                sink.handler(event)
+            except Exception as e:
+                success = False
+                if self.logger:
+                    self.logger.error(f"报警处理失败（{sink.name}）: {e}")
+            duration = time.perf_counter() - start
+            with self._cond:
+                sink.running -= 1
+                if success:
+                    sink.completed += 1
+                else:
+                    sink.failed += 1
+                self._cond.notify_all()
+            if self.on_complete is not None:
+                self.on_complete(sink.name, duration, success)
+
+    def queue_depths(self):
+        """各接收端等待执行的事件数"""
+        with self._cond:
+            return {name: len(sink.queue) for name, sink in self._sinks.items()}
+
+    def stats(self):
+        """工作线程数和各接收端的配置、队列深度和计数"""
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "sinks": {name: sink.stats() for name, sink in self._sinks.items()}
+            }
@@ -0,0 +1,287 @@
+"""
+画面标注模块
+- 字体注册表：字体文件只查找和加载一次，按字号缓存
+- 标签位图缓存：中文标签预先渲染为灰度遮罩（LRU淘汰），绘制时只在标签所在区域用numpy做alpha混合，
+  不再对整帧做 BGR→RGB→PIL→BGR 转换
+- 区域叠加层：区域填充、边框和名称牌预先合成为一个图层，每帧只在区域外接矩形内混合一次
+- 按需绘制：只有在有人查看处理后画面或报警需要截图时才绘制标注帧
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+# 中文字体查找顺序
+FONT_PATHS = [
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",  # 文泉驿微米黑
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",   # 文泉驿正黑
+    "/usr/share/fonts/truetype/arphic/uming.ttc",      # AR PL UMing
+    "/usr/share/fonts/truetype/arphic/ukai.ttc",      # AR PL UKai
+    "/System/Library/Fonts/PingFang.ttc",              # macOS
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"  # 备用
+]
+
+_font_lock = threading.Lock()
+_font_path = None  # 找到的字体文件（None表示尚未查找，""表示没有可用字体）
+_fonts = {}  # {字号: 字体}
+
+
+def get_font(size):
+    """获取指定字号的字体（首次调用时查找字体文件，之后按字号缓存）"""
+    global _font_path
+    size = int(size)
+    with _font_lock:
+        font = _fonts.get(size)
+        if font is not None:
+            return font
+
+        if _font_path is None:
+            _font_path = ""
+            for font_path in FONT_PATHS:
+                if os.path.exists(font_path):
+                    try:
+                        ImageFont.truetype(font_path, size)
+                        _font_path = font_path
+                        break
+                    except OSError:
+                        continue
+
+        font = ImageFont.truetype(_font_path, size) if _font_path else ImageFont.load_default()
+        _fonts[size] = font
+        return font
+
+
+class LabelSprite:
+    """预渲染的文字遮罩"""
+    __slots__ = ('alpha', 'offset_x', 'offset_y', 'width', 'height')
+
+    def __init__(self, alpha, offset_x, offset_y):
+        self.alpha = alpha  # (h, w) uint16，0-255
+        self.offset_x = offset_x  # 遮罩左上角相对于文字绘制原点的偏移（与PIL的textbbox一致）
+        self.offset_y = offset_y
+        self.height, self.width = alpha.shape
+
+
+class LabelSpriteCache:
+    """文字遮罩LRU缓存，按 (文字, 字号) 缓存，颜色在混合时应用"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, font_size):
+        """获取文字遮罩（未命中时渲染并缓存）"""
+        key = (text, int(font_size))
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                self.hits += 1
+                return sprite
+
+        sprite = self._render(text, font_size)
+        with self._lock:
+            self._sprites[key] = sprite
+            self.misses += 1
+            while len(self._sprites) > self.max_entries:
+                self._sprites.popitem(last=False)
+        return sprite
+
+    @staticmethod
+    def _render(text, font_size):
+        """用PIL把文字渲染为灰度遮罩（只渲染文字大小的小图）"""
+        font = get_font(font_size)
+        left, top, right, bottom = ImageDraw.Draw(Image.new('L', (1, 1))).textbbox((0, 0), text, font=font)
+        width, height = max(1, right - left), max(1, bottom - top)
+        mask = Image.new('L', (width, height), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font)
+        return LabelSprite(np.asarray(mask, np.uint16), left, top)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._sprites), "hits": self.hits, "misses": self.misses}
+
+
+label_cache = LabelSpriteCache()
+
+
+def text_size(text, font_size):
+    """文字的宽高（与 PIL textbbox 计算结果一致）"""
+    sprite = label_cache.get(text, font_size)
+    return sprite.width, sprite.height
+
+
+def blend_mask(frame, alpha, x, y, color_bgr):
+    """把遮罩按颜色混合到帧的 (x, y) 位置（只处理遮罩覆盖的区域，超出画面的部分裁剪）"""
+    frame_height, frame_width = frame.shape[:2]
+    height, width = alpha.shape
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(frame_width, x + width), min(frame_height, y + height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    a = alpha[y0 - y:y1 - y, x0 - x:x1 - x, None]
+    roi = frame[y0:y1, x0:x1]
+    color = np.asarray(color_bgr, np.uint16)
+    roi[:] = ((roi * (255 - a) + color * a + 127) // 255).astype(np.uint8)
+
+
+def draw_text(frame, text, origin, color_rgb, font_size):
+    """在帧上绘制文字（origin 与 PIL draw.text 的坐标含义相同，颜色为RGB）"""
+    sprite = label_cache.get(text, font_size)
+    color_bgr = (color_rgb[2], color_rgb[1], color_rgb[0])
+    blend_mask(frame, sprite.alpha, int(origin[0]) + sprite.offset_x, int(origin[1]) + sprite.offset_y, color_bgr)
+
+
+class ZoneOverlay:
+    """区域叠加层
+
+    所有启用区域的填充、边框和名称牌预先合成为一个预乘alpha的图层（只保存各区域外接矩形内的部分），
+    每帧只需在这些矩形内做一次混合：输出 = 图层颜色 + 原图 × (1 - 图层alpha)。
+    区域、颜色、透明度、字号或分辨率变化时需要重新创建。
+    """
+
+    BORDER_THICKNESS = 3
+    PLATE_PADDING = 5
+
+    def __init__(self, zones, polygons, width, height, display_config):
+        self.width = width
+        self.height = height
+        self.rects = []  # [(x0, y0, x1, y1, 预乘颜色×255(uint32), 1-alpha(uint16))]
+        if not zones or width <= 0 or height <= 0:
+            return
+
+        fill_alpha = float(display_config.get('zone_fill_alpha', 0.3))
+        font_size = display_config['font_size']
+        self._color = np.zeros((height, width, 3), np.float32)  # 预乘alpha的颜色（BGR）
+        self._alpha = np.zeros((height, width), np.float32)
+
+        zone_rects = []
+        for zone, polygon in zip(zones, polygons):
+            zone_color = zone.get('color', {})
+            border_color = zone_color.get('border', display_config.get('zone_border_color', [0, 255, 255]))
+            fill_color = zone_color.get('fill', display_config.get('zone_fill_color', [0, 255, 255]))
+
+            margin = self.BORDER_THICKNESS
+            x, y, w, h = cv2.boundingRect(polygon)
+            rect = [x - margin, y - margin, x + w + margin, y + h + margin]
+
+            # 先填充，再绘制边框（与逐帧绘制时的顺序一致）
+            mask = np.zeros((height, width), np.uint8)
+            cv2.fillPoly(mask, [polygon], 255)
+            self._over(mask, fill_color, fill_alpha, rect)
+            mask[:] = 0
+            cv2.polylines(mask, [polygon], True, 255, self.BORDER_THICKNESS)
+            self._over(mask, border_color, 1.0, rect)
+
+            # 名称牌：黑色背景，文字使用边框颜色，位于区域顶点的平均位置
+            name = zone.get('name')
+            if name:
+                center_x = int(np.mean([p[0] for p in zone['points']]))
+                center_y = int(np.mean([p[1] for p in zone['points']]))
+                sprite = label_cache.get(name, font_size)
+                padding = self.PLATE_PADDING
+                plate = [center_x - sprite.width // 2 - padding, center_y - sprite.height // 2 - padding,
+                         center_x + sprite.width // 2 + padding + 1, center_y + sprite.height // 2 + padding + 1]
+                mask[:] = 0
+                mask[max(0, plate[1]):max(0, plate[3]), max(0, plate[0]):max(0, plate[2])] = 255
+                self._over(mask, (0, 0, 0), 1.0, plate)
+
+                # 文字原点与名称牌中心对齐（与PIL绘制时一致，字形可能略超出名称牌）
+                text_x = center_x - sprite.width // 2 + sprite.offset_x
+                text_y = center_y - sprite.height // 2 + sprite.offset_y
+                text_rect = [text_x, text_y, text_x + sprite.width, text_y + sprite.height]
+                mask[:] = 0
+                blend_mask(mask[..., None], sprite.alpha, text_x, text_y, (255,))
+                self._over(mask, border_color, 1.0, text_rect)
+                for extra in (plate, text_rect):
+                    rect = [min(rect[0], extra[0]), min(rect[1], extra[1]), max(rect[2], extra[2]), max(rect[3], extra[3])]
+
+            zone_rects.append(rect)
+
+        for x0, y0, x1, y1 in merge_rects(zone_rects, width, height):
+            color = np.round(self._color[y0:y1, x0:x1] * (255 * 255)).astype(np.uint32)
+            inverse = np.round((1.0 - self._alpha[y0:y1, x0:x1]) * 255).astype(np.uint16)[..., None]
+            self.rects.append((x0, y0, x1, y1, color, inverse))
+        del self._color, self._alpha
+
+    def _over(self, mask, color_bgr, opacity, rect):
+        """把一层（遮罩 × 不透明度，纯色）按 over 运算合成到图层上（只处理 rect 范围）"""
+        x0, y0 = max(0, rect[0]), max(0, rect[1])
+        x1, y1 = min(self.width, rect[2]), min(self.height, rect[3])
+        if x0 >= x1 or y0 >= y1:
+            return
+        a = mask[y0:y1, x0:x1].astype(np.float32) * (opacity / 255.0)
+        color = np.asarray([int(c) for c in color_bgr[:3]], np.float32) / 255.0
+        layer_color = self._color[y0:y1, x0:x1]
+        layer_alpha = self._alpha[y0:y1, x0:x1]
+        layer_color[:] = color * a[..., None] + layer_color * (1.0 - a[..., None])
+        layer_alpha[:] = a + layer_alpha * (1.0 - a)
+
+    def apply(self, frame):
+        """把叠加层混合到帧上（原地修改）"""
+        for x0, y0, x1, y1, color, inverse in self.rects:
+            roi = frame[y0:y1, x0:x1]
+            roi[:] = ((roi * inverse + color + 127) // 255).astype(np.uint8)
+
+
+def merge_rects(rects, width, height):
+    """裁剪到画面范围并合并相互重叠的矩形（避免重叠部分被混合两次）"""
+    merged = []
+    for rect in rects:
+        x0, y0 = max(0, rect[0]), max(0, rect[1])
+        x1, y1 = min(width, rect[2]), min(height, rect[3])
+        if x0 < x1 and y0 < y1:
+            merged.append([x0, y0, x1, y1])
+
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                a, b = merged[i], merged[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    merged[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return [tuple(rect) for rect in merged]
+
+
+class LazyAnnotation:
+    """按需绘制的标注帧：第一次取用时才绘制，同一帧只绘制一次（没有人取用时不绘制）
+
+    绘制阶段和报警处理线程（保存截图）可能同时取用，绘制过程加锁。
+    publish(帧) 在绘制后调用并返回发布的帧序号，记录在 seq 中，用于按序号查找同一帧的编码结果。
+    """
+
+    def __init__(self, render, publish=None):
+        self._render = render
+        self._publish = publish
+        self._frame = None
+        self.seq = 0  # 发布时的帧序号（0表示还没有发布）
+        self._lock = threading.Lock()
+
+    @property
+    def rendered(self):
+        """是否已经绘制"""
+        return self._frame is not None
+
+    def get(self):
+        """获取标注帧（首次调用时绘制）"""
+        if self._frame is None:
+            with self._lock:
+                if self._frame is None:
+                    frame = self._render()
+                    if self._publish is not None:
+                        self.seq = self._publish(frame)
+                    self._frame = frame
+        return self._frame
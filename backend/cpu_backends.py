@@ -0,0 +1,194 @@
+"""
+CPU推理后端模块
+没有CUDA的边缘设备上，导出为 ONNX 或 OpenVINO 格式的模型通常比 PyTorch 直接推理快2-3倍。
+本模块负责识别 models/ 目录中的模型格式，并在模型加载（首次推理创建推理后端）后按推理配置
+设置CPU线程数：
+- PyTorch / TorchScript：torch.set_num_threads / set_num_interop_threads
+- ONNX Runtime：以指定的 intra_op / inter_op 线程数和全部图优化重新创建推理会话
+- OpenVINO：以指定的推理线程数（INFERENCE_NUM_THREADS）和并行流数（NUM_STREAMS）重新编译模型
+线程数为0时使用推理框架的默认值。
+tools/export.py 导出和测试模型后在模型旁写入元数据文件（*.meta.json），记录类别、输入尺寸和实测性能
+"""
+import glob
+import json
+import logging
+import os
+from functools import partial
+
+logger = logging.getLogger('backend')
+
+# 模型格式：{格式: (名称, 是否为CPU后端)}
+MODEL_FORMATS = {
+    "pytorch": ("PyTorch", True),
+    "torchscript": ("TorchScript", True),
+    "tensorrt": ("TensorRT", False),
+    "onnxruntime": ("ONNX Runtime", True),
+    "openvino": ("OpenVINO", True),
+}
+
+OPENVINO_DIR_SUFFIX = "_openvino_model"  # ultralytics 导出的 OpenVINO 模型目录后缀
+METADATA_SUFFIX = ".meta.json"  # 模型元数据文件后缀（模型文件名 + 后缀）
+
+
+def detect_model_format(path):
+    """根据文件名识别模型格式，不支持的格式返回 None"""
+    name = os.path.basename(os.path.normpath(path))
+    if name.endswith(OPENVINO_DIR_SUFFIX) and os.path.isdir(path):
+        return "openvino"
+    if os.path.isdir(path):
+        return None
+    if name.endswith('.pt'):
+        return "pytorch"
+    if name.endswith('.torchscript'):
+        return "torchscript"
+    if name.endswith('.engine'):
+        return "tensorrt"
+    if name.endswith('.onnx'):
+        return "onnxruntime"
+    return None
+
+
+def model_size(path):
+    """模型大小（字节），OpenVINO模型目录为目录内文件的总大小"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)
+                   if os.path.isfile(os.path.join(path, name)))
+    return os.path.getsize(path)
+
+
+def metadata_path(path):
+    """模型元数据文件路径"""
+    return os.path.normpath(path) + METADATA_SUFFIX
+
+
+_metadata_cache = {}  # {元数据文件路径: (修改时间, 元数据)}
+
+
+def load_model_metadata(path):
+    """读取模型的元数据（按文件修改时间缓存），没有元数据文件或读取失败时返回 None"""
+    meta_path = metadata_path(path)
+    try:
+        mtime = os.path.getmtime(meta_path)
+    except OSError:
+        return None
+    cached = _metadata_cache.get(meta_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取模型元数据失败 {meta_path}: {e}")
+        return None
+    _metadata_cache[meta_path] = (mtime, metadata)
+    return metadata
+
+
+def save_model_metadata(path, metadata):
+    """写入模型的元数据文件"""
+    with open(metadata_path(path), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+
+
+def _backend_holder(yolo_model):
+    """返回保存推理会话的对象（新版 ultralytics 保存在 AutoBackend.backend 中，旧版直接保存在 AutoBackend 中）"""
+    predictor = getattr(yolo_model, 'predictor', None)
+    autobackend = getattr(predictor, 'model', None)
+    if autobackend is None:
+        return None
+    return getattr(autobackend, 'backend', None) or autobackend
+
+
+def tune_model_backend(yolo_model, model_format, intra_op_threads=0, inter_op_threads=0):
+    """按线程配置调整模型的推理后端（必须在首次推理之后调用，此时推理后端已经创建）
+
+    同一模型的线程配置没有变化时直接返回；返回 True 表示重新创建了推理会话（需要重新预热）。
+    """
+    intra_op_threads = max(0, int(intra_op_threads or 0))
+    inter_op_threads = max(0, int(inter_op_threads or 0))
+    settings = (intra_op_threads, inter_op_threads)
+    if getattr(yolo_model, '_cpu_threads', None) == settings:
+        return False
+
+    if model_format in ("pytorch", "torchscript"):
+        _tune_pytorch(intra_op_threads, inter_op_threads)
+        yolo_model._cpu_threads = settings
+        return False
+
+    holder = _backend_holder(yolo_model)
+    if holder is None:
+        logger.warning("模型尚未创建推理后端，暂不设置CPU线程数")
+        return False
+
+    model_path = str(yolo_model.ckpt_path)
+    if model_format == "onnxruntime":
+        rebuilt = _tune_onnxruntime(holder, model_path, intra_op_threads, inter_op_threads)
+    elif model_format == "openvino":
+        rebuilt = _tune_openvino(holder, model_path, intra_op_threads, inter_op_threads)
+    else:
+        return False
+    yolo_model._cpu_threads = settings
+    return rebuilt
+
+
+def _tune_pytorch(intra_op_threads, inter_op_threads):
+    import torch
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads and torch.get_num_interop_threads() != inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # inter-op 线程池在进程中开始并行计算后就不能再修改
+            logger.warning("PyTorch inter-op 线程数只能在首次并行计算前设置，重启服务后生效")
+    logger.info(f"PyTorch CPU线程数: intra-op={torch.get_num_threads()}, inter-op={torch.get_num_interop_threads()}")
+
+
+def _tune_onnxruntime(holder, model_path, intra_op_threads, inter_op_threads):
+    session = getattr(holder, 'session', None)
+    if session is None:
+        logger.warning("未找到 ONNX Runtime 推理会话，无法设置线程数")
+        return False
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    if inter_op_threads > 1:
+        # inter-op 线程只在并行执行模式下生效
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+    providers = session.get_providers()
+    holder.session = onnxruntime.InferenceSession(model_path, options, providers=providers)
+    logger.info(f"ONNX Runtime 推理会话已重建: intra-op={intra_op_threads or '默认'}, "
+                f"inter-op={inter_op_threads or '默认'}, providers={providers}")
+    return True
+
+
+def _tune_openvino(holder, model_path, intra_op_threads, inter_op_threads):
+    compiled_model = getattr(holder, 'ov_compiled_model', None)
+    if compiled_model is None:
+        logger.warning("未找到 OpenVINO 编译模型，无法设置线程数")
+        return False
+    import openvino as ov
+
+    xml_files = glob.glob(os.path.join(model_path, "*.xml")) if os.path.isdir(model_path) else [model_path]
+    if not xml_files:
+        logger.warning(f"OpenVINO 模型目录中没有 .xml 文件: {model_path}")
+        return False
+
+    core = ov.Core()
+    ov_model = core.read_model(xml_files[0])
+    if ov_model.get_parameters()[0].get_layout().empty:
+        ov_model.get_parameters()[0].set_layout(ov.Layout("NCHW"))
+    config = {"PERFORMANCE_HINT": compiled_model.get_property("PERFORMANCE_HINT")}
+    if intra_op_threads:
+        config["INFERENCE_NUM_THREADS"] = intra_op_threads
+    if inter_op_threads:
+        config["NUM_STREAMS"] = inter_op_threads
+    holder.ov_compiled_model = core.compile_model(ov_model, device_name="CPU", config=config)
+    if hasattr(holder, 'compile_model'):
+        # 新版 ultralytics 在输入尺寸变化时用该函数重新编译，保持相同的线程配置
+        holder.compile_model = partial(core.compile_model, device_name="CPU", config=config)
+    logger.info(f"OpenVINO 模型已重新编译: 推理线程={intra_op_threads or '默认'}, 并行流={inter_op_threads or '默认'}")
+    return True
@@ -0,0 +1,49 @@
+"""
+检测结果模块
+推理和跟踪完成后，一次性把 results.boxes 转换为连续的numpy数组（xyxy、类别、置信度、跟踪ID），
+之后的类别/置信度过滤、区域判断、报警、绘制和推送都直接使用这些数组，不再逐框访问张量
+"""
+import numpy as np
+
+
+class Detections:
+    """一帧跟踪结果（numpy数组）"""
+    __slots__ = ('xyxy', 'cls', 'conf', 'ids')
+
+    def __init__(self, xyxy, cls, conf, ids):
+        self.xyxy = xyxy  # (N, 4) float32
+        self.cls = cls  # (N,) int64
+        self.conf = conf  # (N,) float32
+        self.ids = ids  # (N,) int64 跟踪ID
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((0, 4), np.float32), np.empty(0, np.int64),
+                   np.empty(0, np.float32), np.empty(0, np.int64))
+
+    @classmethod
+    def from_boxes(cls, boxes):
+        """从 ultralytics Boxes 转换（只做一次设备到主机的拷贝），没有跟踪ID时返回空结果"""
+        if boxes is None or len(boxes) == 0 or boxes.id is None:
+            return cls.empty()
+        # 带跟踪ID时 data 的列为 [x1, y1, x2, y2, id, conf, cls]
+        data = boxes.data.cpu().numpy()
+        return cls(
+            np.ascontiguousarray(data[:, :4], dtype=np.float32),
+            data[:, 6].astype(np.int64),
+            data[:, 5].astype(np.float32),
+            data[:, 4].astype(np.int64)
+        )
+
+    def __len__(self):
+        return len(self.cls)
+
+    def __getitem__(self, index):
+        """按布尔掩码或下标数组取子集"""
+        return Detections(self.xyxy[index], self.cls[index], self.conf[index], self.ids[index])
+
+    @property
+    def centers(self):
+        """检测框中心点 (N, 2)"""
+        return np.stack([(self.xyxy[:, 0] + self.xyxy[:, 2]) / 2,
+                         (self.xyxy[:, 1] + self.xyxy[:, 3]) / 2], axis=1)
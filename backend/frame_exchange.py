@@ -0,0 +1,276 @@
+"""
+帧交换模块
+生产者（视频读取线程、检测线程）发布最新帧（附带采集时间和视频流时间戳），消费者（检测线程、MJPEG视频流、遮挡检测）
+阻塞等待比自己已处理的更新的帧，通过序号判断是否有新帧，避免轮询和重复处理；
+JPEG编码结果按 (帧序号, 质量) 缓存，所有MJPEG客户端和WebSocket推送共享同一份编码结果；
+检测流水线各阶段之间通过有界的交接队列传递结果（只保留最新的结果）
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class CaptureInfo:
+    """一帧的采集信息：帧序号、读取完成时的单调时钟时间和系统时间，以及视频流的显示时间戳（PTS，秒）
+
+    单调时钟时间用于计算帧在流水线中的延迟（采集→推理/报警/客户端），不受系统时间调整影响；
+    无法获取 PTS 时为 None。
+    """
+    __slots__ = ('seq', 'monotonic', 'wall', 'pts')
+
+    def __init__(self, pts=None):
+        self.seq = 0  # 发布到交换槽时分配
+        self.monotonic = time.monotonic()
+        self.wall = time.time()
+        self.pts = pts
+
+    def age(self):
+        """距采集的时间（秒）"""
+        return time.monotonic() - self.monotonic
+
+    def to_dict(self):
+        """推送给客户端的采集信息（time 为采集时的Unix时间戳，秒）"""
+        return {
+            "seq": self.seq,
+            "time": round(self.wall, 3),
+            "pts": round(self.pts, 3) if self.pts is not None else None
+        }
+
+
+class LatestFrameSlot:
+    """只保存最新一帧的交换槽（单生产者、多消费者）
+
+    每次发布帧序号加一并唤醒所有等待者。发布的是只读视图，消费者之间共享同一块内存，
+    无需复制；需要修改画面的消费者应自行 copy()。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0  # 帧序号（单调递增，0表示还没有帧）
+        self._capture = None  # 最新帧的采集信息
+        self._closed = False
+
+    def publish(self, frame, capture=None):
+        """发布新帧（capture 为采集信息，未提供时以发布时间为采集时间），返回其序号"""
+        view = frame.view()
+        view.flags.writeable = False
+        capture = capture or CaptureInfo()
+        with self._cond:
+            self._seq += 1
+            capture.seq = self._seq
+            self._frame = view
+            self._capture = capture
+            self._cond.notify_all()
+            return self._seq
+
+    def latest(self):
+        """获取最新帧，返回 (seq, frame)，还没有帧时 frame 为 None"""
+        with self._cond:
+            return self._seq, self._frame
+
+    def latest_capture(self):
+        """获取最新帧及其采集信息，返回 (seq, frame, capture)"""
+        with self._cond:
+            return self._seq, self._frame, self._capture
+
+    @property
+    def frame(self):
+        """最新帧（只读视图）"""
+        return self._frame
+
+    @property
+    def seq(self):
+        """最新帧序号"""
+        return self._seq
+
+    @property
+    def timestamp(self):
+        """最新帧的采集时间（Unix时间戳，还没有帧时为0）"""
+        capture = self._capture
+        return capture.wall if capture is not None else 0.0
+
+    def wait_newer(self, last_seq, timeout=None):
+        """阻塞等待序号大于 last_seq 的帧
+
+        返回 (seq, frame)；超时或交换槽已关闭时返回 (last_seq, None)。
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > last_seq or self._closed, timeout):
+                return last_seq, None
+            if self._seq <= last_seq:
+                return last_seq, None
+            return self._seq, self._frame
+
+    def close(self):
+        """关闭交换槽，唤醒所有等待者（管线停止时调用）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class EncodedFrame:
+    """一帧的JPEG编码结果"""
+    __slots__ = ('seq', 'quality', 'jpeg', '_part')
+
+    def __init__(self, seq, quality, jpeg):
+        self.seq = seq
+        self.quality = quality
+        self.jpeg = jpeg  # JPEG字节
+        self._part = None
+
+    @property
+    def part(self):
+        """MJPEG multipart 分块（首次访问时生成，之后所有客户端共享）"""
+        if self._part is None:
+            self._part = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + self.jpeg + b'\r\n'
+        return self._part
+
+
+class JpegCache:
+    """交换槽最新帧的JPEG编码缓存
+
+    以 (帧序号, 质量) 为键，每帧每个质量档位最多编码一次；只保留最新一帧的编码结果。
+    on_encode(耗时秒数) 在每次实际编码后调用（用于统计编码耗时）。
+    """
+
+    def __init__(self, slot, on_encode=None):
+        self.slot = slot
+        self.on_encode = on_encode
+        self._lock = threading.Lock()
+        self._seq = 0  # 缓存对应的帧序号
+        self._entries = {}  # {quality: EncodedFrame}
+        self.encode_count = 0  # 实际编码次数
+        self.hit_count = 0  # 命中缓存次数
+        self._viewers = 0  # 正在读取的视频流客户端数量
+
+    def get(self, quality=85):
+        """获取最新帧的编码结果，还没有帧时返回None"""
+        seq, frame = self.slot.latest()
+        if frame is None:
+            return None
+        return self._encode(seq, frame, quality)
+
+    def wait_newer(self, last_seq, quality=85, timeout=None):
+        """等待序号大于 last_seq 的帧并返回其编码结果，超时返回None"""
+        seq, frame = self.slot.wait_newer(last_seq, timeout)
+        if frame is None:
+            return None
+        return self._encode(seq, frame, quality)
+
+    def encode(self, seq, frame, quality=85):
+        """获取指定帧（seq 为其在交换槽中的序号）的编码结果
+
+        与缓存中是同一帧时共享编码结果；缓存中已是更新的帧时单独编码，不替换缓存。
+        """
+        with self._lock:
+            if seq >= self._seq:
+                return self._encode_cached(seq, frame, quality)
+        return self._imencode(seq, frame, quality)
+
+    def _encode(self, seq, frame, quality):
+        """命中缓存直接返回，否则编码并缓存（同一帧同一质量的并发请求只编码一次）"""
+        with self._lock:
+            if seq < self._seq:
+                # 已有更新的帧，直接使用最新帧
+                seq, frame = self.slot.latest()
+            return self._encode_cached(seq, frame, quality)
+
+    def _encode_cached(self, seq, frame, quality):
+        """按 (帧序号, 质量) 查找或编码并缓存（调用时持有锁）"""
+        if seq != self._seq:
+            self._seq = seq
+            self._entries = {}
+        encoded = self._entries.get(quality)
+        if encoded is not None:
+            self.hit_count += 1
+            return encoded
+        encoded = self._imencode(seq, frame, quality)
+        if encoded is not None:
+            self._entries[quality] = encoded
+        return encoded
+
+    def _imencode(self, seq, frame, quality):
+        """编码一帧，失败时返回None"""
+        start = time.perf_counter()
+        success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        if not success:
+            return None
+        self.encode_count += 1
+        if self.on_encode is not None:
+            self.on_encode(time.perf_counter() - start)
+        return EncodedFrame(seq, quality, buffer.tobytes())
+
+    def add_viewer(self):
+        """视频流客户端开始读取"""
+        with self._lock:
+            self._viewers += 1
+
+    def remove_viewer(self):
+        """视频流客户端断开"""
+        with self._lock:
+            self._viewers = max(0, self._viewers - 1)
+
+    @property
+    def viewers(self):
+        """正在读取的视频流客户端数量"""
+        return self._viewers
+
+    def stats(self):
+        """编码/命中次数和客户端数量统计"""
+        with self._lock:
+            return {"encodes": self.encode_count, "hits": self.hit_count, "viewers": self._viewers}
+
+
+class StageHandoff:
+    """流水线相邻阶段之间的有界交接队列
+
+    队列满时丢弃最旧的一项（下游总是处理最新的结果，上游从不因下游变慢而阻塞），
+    记录当前深度、放入次数和丢弃次数用于观察各阶段是否跟得上。
+    """
+
+    def __init__(self, name, maxsize=1):
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self._cond = threading.Condition()
+        self._items = deque()
+        self._closed = False
+        self.put_count = 0  # 放入次数
+        self.drop_count = 0  # 因下游未及时取走而丢弃的次数
+
+    def put(self, item):
+        """放入一项（队列满时丢弃最旧的一项）"""
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.drop_count += 1
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """取出最早的一项，超时或已关闭时返回None"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def close(self):
+        """关闭队列，唤醒等待者（管线停止时调用）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        """当前深度、容量、放入次数和丢弃次数"""
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "maxsize": self.maxsize,
+                "puts": self.put_count,
+                "drops": self.drop_count
+            }
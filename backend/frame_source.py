@@ -0,0 +1,342 @@
+"""
+视频帧源模块
+提供两种解码方式：
+- opencv：cv2.VideoCapture（默认，兼容原有行为）
+- ffmpeg：ffmpeg子进程输出rawvideo到管道，读入预分配的numpy环形缓冲区，
+  支持解码时缩放、设置解码线程数，以及连接/读取超时（摄像头断线时不会永久阻塞）
+"""
+import json
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+# 默认解码配置（每路摄像头可单独配置）
+DEFAULT_DECODER_CONFIG = {
+    "backend": "opencv",  # 解码方式：opencv / ffmpeg
+    "width": 0,  # 输出宽度（0表示保持原始分辨率；只设置宽或高时按比例缩放）
+    "height": 0,  # 输出高度
+    "threads": 0,  # ffmpeg解码线程数（0为自动）
+    "scale_flags": "fast_bilinear",  # ffmpeg缩放算法
+    "connect_timeout": 10.0,  # 连接超时（秒）：探测视频流及等待第一帧
+    "read_timeout": 5.0,  # 读取超时（秒）：两帧之间的最大间隔
+    "ring_size": 4,  # 预分配的帧缓冲数量
+    "realtime": False  # 本地视频文件按视频帧率读取（网络视频流忽略该项；False时尽快读取）
+}
+
+DECODER_BACKENDS = ("opencv", "ffmpeg")
+SCALE_FLAGS = ("fast_bilinear", "bilinear", "bicubic", "area", "neighbor")
+
+
+def normalize_decoder_config(config=None):
+    """合并默认值并校验解码配置，非法值抛出 ValueError"""
+    merged = dict(DEFAULT_DECODER_CONFIG)
+    if config:
+        merged.update({k: v for k, v in config.items() if k in DEFAULT_DECODER_CONFIG})
+
+    merged["backend"] = str(merged["backend"]).lower()
+    if merged["backend"] not in DECODER_BACKENDS:
+        raise ValueError(f"不支持的解码方式: {merged['backend']}，可选: {', '.join(DECODER_BACKENDS)}")
+    if merged["scale_flags"] not in SCALE_FLAGS:
+        raise ValueError(f"不支持的缩放算法: {merged['scale_flags']}，可选: {', '.join(SCALE_FLAGS)}")
+
+    for key in ("width", "height", "threads"):
+        merged[key] = int(merged[key])
+        if merged[key] < 0:
+            raise ValueError(f"{key} 不能为负数")
+    for key in ("connect_timeout", "read_timeout"):
+        merged[key] = float(merged[key])
+        if merged[key] <= 0:
+            raise ValueError(f"{key} 必须大于0")
+    merged["realtime"] = bool(merged["realtime"])
+    merged["ring_size"] = int(merged["ring_size"])
+    if not 2 <= merged["ring_size"] <= 32:
+        raise ValueError("ring_size 必须在2-32之间")
+    return merged
+
+
+def resolve_output_size(src_width, src_height, width=0, height=0):
+    """根据目标宽高计算输出分辨率（只指定一边时按比例缩放，结果取偶数）"""
+    if width and height:
+        return width, height
+    if not src_width or not src_height:
+        return src_width, src_height
+    if width:
+        return width, max(2, int(round(src_height * width / src_width / 2.0)) * 2)
+    if height:
+        return max(2, int(round(src_width * height / src_height / 2.0)) * 2), height
+    return src_width, src_height
+
+
+def is_network_stream(url):
+    """是否为网络视频流（而不是本地文件）"""
+    return "://" in str(url)
+
+
+class OpenCVFrameSource:
+    """基于 cv2.VideoCapture 的帧源（设置了输出分辨率时在解码后缩放）"""
+
+    def __init__(self, url, config):
+        self.url = url
+        self.config = config
+        self.width = 0
+        self.height = 0
+        self.fps = 0.0
+        self.pts = None  # 最近读取的一帧在视频流中的时间戳（秒）
+        self._cap = None
+        self._resize_to = None
+
+    def open(self):
+        """打开视频流，成功返回True"""
+        params = []
+        # OpenCV 4.6+ 支持打开/读取超时（毫秒）
+        if hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+            params = [
+                cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.config["connect_timeout"] * 1000),
+                cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(self.config["read_timeout"] * 1000)
+            ]
+        if params and is_network_stream(self.url):
+            self._cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG, params)
+        else:
+            self._cap = cv2.VideoCapture(self.url)
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not self._cap.isOpened():
+            return False
+
+        src_width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        src_height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps > 0 else 0.0
+        self.width, self.height = resolve_output_size(
+            src_width, src_height, self.config["width"], self.config["height"])
+        if (self.width, self.height) != (src_width, src_height):
+            self._resize_to = (self.width, self.height)
+        return True
+
+    def read(self):
+        """读取一帧，返回 (success, frame)"""
+        success, frame = self._cap.read()
+        if success:
+            pos_msec = self._cap.get(cv2.CAP_PROP_POS_MSEC)
+            self.pts = pos_msec / 1000.0 if pos_msec >= 0 else None
+            if self._resize_to is not None:
+                frame = cv2.resize(frame, self._resize_to, interpolation=cv2.INTER_AREA)
+        return success, frame
+
+    def last_error(self):
+        """OpenCV不提供解码错误信息"""
+        return ""
+
+    def release(self):
+        """释放视频流"""
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class FFmpegFrameSource:
+    """基于 ffmpeg 子进程的帧源
+
+    ffmpeg 将解码（并缩放）后的 bgr24 原始帧写入管道，读取线程直接 readinto 到预分配的缓冲区，
+    不再为每一帧分配新的数组。缓冲区以环形方式复用：若某个缓冲区仍被其他线程引用
+    （如仍是最新帧、正在推理或被遮挡检测保留），则为该位置换一块新缓冲区，已交出的帧不会被覆盖。
+    """
+
+    def __init__(self, url, config, logger=None):
+        self.url = url
+        self.config = config
+        self.logger = logger
+        self.width = 0
+        self.height = 0
+        self.fps = 0.0
+        self.pts = None  # rawvideo 管道不携带时间戳
+        self.reallocations = 0  # 因缓冲区仍被占用而重新分配的次数
+        self._process = None
+        self._ring = []
+        self._ring_index = 0
+        self._frames_read = 0
+        self._stderr_tail = deque(maxlen=20)
+
+    @property
+    def process(self):
+        """ffmpeg 解码子进程（未启动时为 None）"""
+        return self._process
+
+    def _input_args(self):
+        """输入相关参数（RTSP流使用TCP传输）"""
+        args = []
+        if str(self.url).startswith("rtsp://"):
+            args += ["-rtsp_transport", "tcp"]
+        return args
+
+    def probe(self):
+        """使用 ffprobe 获取视频流的分辨率和帧率，失败返回 None"""
+        cmd = ["ffprobe", "-v", "error"] + self._input_args() + [
+            "-select_streams", "v:0",
+            "-show_entries", "stream=width,height,avg_frame_rate,r_frame_rate",
+            "-of", "json", self.url
+        ]
+        try:
+            output = subprocess.run(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                timeout=self.config["connect_timeout"], check=True
+            ).stdout
+            stream = json.loads(output)["streams"][0]
+        except FileNotFoundError:
+            raise
+        except (subprocess.SubprocessError, ValueError, KeyError, IndexError) as e:
+            if self.logger:
+                self.logger.warning(f"ffprobe探测视频流失败: {e}")
+            return None
+
+        fps = 0.0
+        for key in ("avg_frame_rate", "r_frame_rate"):
+            num, _, den = str(stream.get(key, "0/0")).partition("/")
+            try:
+                fps = float(num) / float(den or 1)
+            except (ValueError, ZeroDivisionError):
+                fps = 0.0
+            if fps > 0:
+                break
+        return int(stream["width"]), int(stream["height"]), fps
+
+    def build_command(self):
+        """构建 ffmpeg 解码命令"""
+        cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin"]
+        if self.config["threads"] > 0:
+            cmd += ["-threads", str(self.config["threads"])]
+        cmd += self._input_args() + ["-i", self.url, "-map", "0:v:0", "-an", "-sn"]
+        cmd += ["-vf", f"scale={self.width}:{self.height}:flags={self.config['scale_flags']}"]
+        cmd += ["-pix_fmt", "bgr24", "-f", "rawvideo", "pipe:1"]
+        return cmd
+
+    def open(self):
+        """探测分辨率并启动 ffmpeg 进程，成功返回True（第一帧在 connect_timeout 内读取）"""
+        try:
+            probed = self.probe()
+        except FileNotFoundError:
+            if self.logger:
+                self.logger.error("ffprobe未找到，请确保已安装ffmpeg")
+            return False
+
+        if probed is not None:
+            src_width, src_height, self.fps = probed
+        elif self.config["width"] and self.config["height"]:
+            # 探测失败但已指定输出分辨率，仍可直接解码
+            src_width, src_height = self.config["width"], self.config["height"]
+        else:
+            return False
+        self.width, self.height = resolve_output_size(
+            src_width, src_height, self.config["width"], self.config["height"])
+        if not self.width or not self.height:
+            return False
+
+        try:
+            self._process = subprocess.Popen(
+                self.build_command(),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=0
+            )
+        except FileNotFoundError:
+            if self.logger:
+                self.logger.error("ffmpeg未找到，请确保已安装ffmpeg")
+            return False
+
+        threading.Thread(target=self._drain_stderr, args=(self._process.stderr,), daemon=True).start()
+        shape = (self.height, self.width, 3)
+        self._ring = [np.empty(shape, dtype=np.uint8) for _ in range(self.config["ring_size"])]
+        self._ring_index = 0
+        self._frames_read = 0
+        return True
+
+    def _drain_stderr(self, stream):
+        """持续读取ffmpeg的错误输出（避免管道写满阻塞），保留最后几行用于排查"""
+        try:
+            for line in iter(stream.readline, b""):
+                self._stderr_tail.append(line.decode("utf-8", errors="replace").strip())
+        except (OSError, ValueError):
+            pass
+
+    def last_error(self):
+        """ffmpeg最近输出的错误信息"""
+        return " | ".join(line for line in self._stderr_tail if line)
+
+    def _next_buffer(self):
+        """取环形缓冲区中的下一块（仍被外部引用时替换为新缓冲区）"""
+        index = self._ring_index
+        self._ring_index = (index + 1) % len(self._ring)
+        # 引用计数为2表示只有环形列表和 getrefcount 参数本身持有该缓冲区
+        if sys.getrefcount(self._ring[index]) > 2:
+            self._ring[index] = np.empty_like(self._ring[index])
+            self.reallocations += 1
+        return self._ring[index]
+
+    def _read_exact(self, view, timeout):
+        """在超时时间内把一整帧读入 view，EOF返回False，超时抛出 TimeoutError"""
+        stdout = self._process.stdout
+        fd = stdout.fileno()
+        deadline = time.monotonic() + timeout
+        offset = 0
+        total = len(view)
+        while offset < total:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"{timeout:.1f}秒内未读取到完整视频帧")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            count = stdout.readinto(view[offset:])
+            if not count:
+                return False
+            offset += count
+        return True
+
+    def read(self):
+        """读取一帧，返回 (success, frame)；超时抛出 TimeoutError"""
+        if self._process is None:
+            return False, None
+        frame = self._next_buffer()
+        timeout = self.config["read_timeout"] if self._frames_read else self.config["connect_timeout"]
+        with memoryview(frame) as view, view.cast("B") as flat:
+            success = self._read_exact(flat, timeout)
+        if not success:
+            return False, None
+        self._frames_read += 1
+        return True, frame
+
+    def release(self):
+        """结束 ffmpeg 进程"""
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.kill()
+            process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        for stream in (process.stdout, process.stderr):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+def create_frame_source(url, config, logger=None):
+    """根据解码配置创建帧源"""
+    if config["backend"] == "ffmpeg":
+        if os.name == "nt":
+            # Windows下 select 不支持管道，无法实现读取超时
+            if logger:
+                logger.warning("Windows下不支持ffmpeg管道解码，已使用OpenCV解码")
+            return OpenCVFrameSource(url, config)
+        return FFmpegFrameSource(url, config, logger=logger)
+    return OpenCVFrameSource(url, config)
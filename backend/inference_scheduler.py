@@ -0,0 +1,256 @@
+"""
+批量推理调度模块
+收集各路摄像头（或各图块）的最新帧，合并为一个批次送入模型推理，
+并将结果分发回各自的检测线程（跟踪器状态仍由各路管线自己维护）
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class InferenceRequest:
+    """一次推理请求（某一路视频流的一帧）"""
+    __slots__ = ('stream_id', 'frame', 'submit_time', 'done', 'result', 'error')
+
+    def __init__(self, stream_id, frame):
+        self.stream_id = stream_id
+        self.frame = frame
+        self.submit_time = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _percentile(values, percent):
+    """计算百分位数（values为已排序列表）"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round((len(values) - 1) * percent / 100.0)))
+    return values[index]
+
+
+class BatchInferenceScheduler:
+    """跨摄像头批量推理调度器
+
+    - 每路视频流同一时刻最多只有一个待推理请求（只推理最新帧）
+    - 当所有活跃视频流都已提交、或达到最大批大小、或最早的请求等待超过 max_wait 时，立即推理
+    - 模型不支持批量推理（如固定batch=1的TensorRT引擎）时自动退化为逐帧推理
+    """
+
+    def __init__(self, infer_fn, max_batch_size=8, max_wait=0.01, active_window=1.0, logger=None):
+        self.infer_fn = infer_fn  # 批量推理函数：接收帧列表，返回等长的结果列表
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))  # 批处理最多引入的等待时间（秒）
+        self.active_window = active_window  # 最近该时长内提交过请求的视频流视为活跃
+        self.logger = logger
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()  # {stream_id: InferenceRequest}，按提交顺序排列
+        self._last_submit = {}  # {stream_id: 最近一次提交时间}
+        self._batch_supported = True  # 当前模型是否支持批量推理
+        self._thread = None
+        self._stop_event = None
+        # 统计信息
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=500)
+        self._infer_times = deque(maxlen=500)
+        self._wait_times = deque(maxlen=500)
+        self._batch_size_counts = {}
+        self._total_batches = 0
+        self._total_frames = 0
+        self._total_errors = 0
+        self._frame_cost = 0.0  # 单帧推理耗时（批推理耗时 / 批大小，指数滑动平均）
+
+    def configure(self, max_batch_size=None, max_wait=None):
+        """更新批大小和最大等待时间"""
+        with self._cond:
+            if max_batch_size is not None:
+                self.max_batch_size = max(1, int(max_batch_size))
+            if max_wait is not None:
+                self.max_wait = max(0.0, float(max_wait))
+            self._cond.notify_all()
+
+    def reset_capabilities(self):
+        """模型切换后重新尝试批量推理"""
+        with self._cond:
+            self._batch_supported = True
+
+    def register_stream(self, stream_id):
+        """注册视频流（视为活跃，直到超过 active_window 未提交）"""
+        with self._cond:
+            self._last_submit[stream_id] = time.monotonic()
+
+    def unregister_stream(self, stream_id):
+        """注销视频流，并唤醒其未完成的请求"""
+        with self._cond:
+            self._last_submit.pop(stream_id, None)
+            request = self._pending.pop(stream_id, None)
+            self._cond.notify_all()
+        if request is not None:
+            request.error = RuntimeError(f"视频流 {stream_id} 已注销")
+            request.done.set()
+
+    def submit(self, stream_id, frame, timeout=None):
+        """提交一帧并阻塞等待推理结果
+
+        同一视频流如果还有未被取走的旧请求，旧请求会被新帧替换（旧请求返回None）。
+        """
+        results = self.submit_many([(stream_id, frame)], timeout)
+        return None if results is None else results[0]
+
+    def submit_many(self, items, timeout=None):
+        """同时提交多帧（items 为 [(stream_id, frame)]，如同一帧的多个裁剪区域）并等待全部结果
+
+        所有帧在同一时刻加入待推理队列，可以合并到同一批次；返回与 items 等长的结果列表，
+        其中任一请求被新帧替换时返回None。
+        """
+        requests = [InferenceRequest(stream_id, frame) for stream_id, frame in items]
+        superseded = []
+        with self._cond:
+            for request in requests:
+                old = self._pending.pop(request.stream_id, None)
+                if old is not None:
+                    superseded.append(old)
+                self._pending[request.stream_id] = request
+                self._last_submit[request.stream_id] = request.submit_time
+            self._cond.notify_all()
+        for old in superseded:
+            old.done.set()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for request in requests:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not request.done.wait(remaining):
+                with self._cond:
+                    for pending in requests:
+                        if self._pending.get(pending.stream_id) is pending:
+                            del self._pending[pending.stream_id]
+                raise TimeoutError(f"视频流 {request.stream_id} 推理超时")
+            if request.error is not None:
+                raise request.error
+        if any(request.result is None for request in requests):
+            return None
+        return [request.result for request in requests]
+
+    def start(self, stop_event):
+        """启动调度线程"""
+        self._stop_event = stop_event
+        self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def _active_stream_count(self, now):
+        """最近 active_window 内提交过请求的视频流数量"""
+        return sum(1 for t in self._last_submit.values() if now - t <= self.active_window)
+
+    def _collect_batch(self):
+        """等待并取出一个批次（返回请求列表，停止时返回空列表）"""
+        with self._cond:
+            while not self._pending:
+                if self._stop_event.is_set():
+                    return []
+                self._cond.wait(0.5)
+
+            max_batch_size = self.max_batch_size if self._batch_supported else 1
+            oldest = next(iter(self._pending.values()))
+            deadline = oldest.submit_time + self.max_wait
+            while True:
+                now = time.monotonic()
+                target = min(max_batch_size, max(1, self._active_stream_count(now)))
+                if len(self._pending) >= target or now >= deadline or self._stop_event.is_set():
+                    break
+                self._cond.wait(deadline - now)
+
+            batch = []
+            while self._pending and len(batch) < max_batch_size:
+                _, request = self._pending.popitem(last=False)
+                batch.append(request)
+            return batch
+
+    def _infer(self, batch):
+        """执行推理，批量推理失败时退化为逐帧推理"""
+        frames = [request.frame for request in batch]
+        if len(frames) > 1:
+            try:
+                return list(self.infer_fn(frames))
+            except Exception as e:
+                with self._cond:
+                    self._batch_supported = False
+                if self.logger:
+                    self.logger.warning(f"当前模型不支持批量推理，已切换为逐帧推理: {e}")
+        return [result for frame in frames for result in self.infer_fn([frame])]
+
+    def _run(self):
+        """调度线程主循环"""
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            start_time = time.monotonic()
+            try:
+                results = self._infer(batch)
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception as e:
+                with self._stats_lock:
+                    self._total_errors += 1
+                for request in batch:
+                    request.error = e
+            infer_time = time.monotonic() - start_time
+
+            for request in batch:
+                request.done.set()
+            self._record(batch, start_time, infer_time)
+
+    def _record(self, batch, start_time, infer_time):
+        """记录批大小和耗时统计"""
+        with self._stats_lock:
+            size = len(batch)
+            self._batch_sizes.append(size)
+            self._infer_times.append(infer_time)
+            for request in batch:
+                self._wait_times.append(start_time - request.submit_time)
+            self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+            self._total_batches += 1
+            self._total_frames += size
+            cost = infer_time / size
+            self._frame_cost = cost if self._frame_cost <= 0 else self._frame_cost + 0.1 * (cost - self._frame_cost)
+
+    def frame_cost(self):
+        """单帧推理耗时（秒，按批大小分摊），还没有推理过时为0"""
+        return self._frame_cost
+
+    def report(self):
+        """批大小/延迟统计报告（用于调优 max_batch_size 和 max_wait）"""
+        with self._stats_lock:
+            batch_sizes = list(self._batch_sizes)
+            infer_times = sorted(self._infer_times)
+            wait_times = sorted(self._wait_times)
+            report = {
+                "total_batches": self._total_batches,
+                "total_frames": self._total_frames,
+                "total_errors": self._total_errors,
+                "batch_size_counts": {str(k): v for k, v in sorted(self._batch_size_counts.items())},
+                "frame_cost_ms": round(self._frame_cost * 1000, 2),
+            }
+        with self._cond:
+            report.update({
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "batch_supported": self._batch_supported,
+                "pending": len(self._pending),
+                "active_streams": self._active_stream_count(time.monotonic()),
+            })
+        report.update({
+            "avg_batch_size": round(sum(batch_sizes) / len(batch_sizes), 2) if batch_sizes else 0.0,
+            "infer_ms": {
+                "avg": round(sum(infer_times) / len(infer_times) * 1000, 2) if infer_times else 0.0,
+                "p50": round(_percentile(infer_times, 50) * 1000, 2),
+                "p95": round(_percentile(infer_times, 95) * 1000, 2),
+            },
+            "wait_ms": {
+                "avg": round(sum(wait_times) / len(wait_times) * 1000, 2) if wait_times else 0.0,
+                "p50": round(_percentile(wait_times, 50) * 1000, 2),
+                "p95": round(_percentile(wait_times, 95) * 1000, 2),
+            },
+        })
+        return report
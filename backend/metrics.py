@@ -0,0 +1,200 @@
+"""
+运行指标模块
+以 Prometheus 文本格式（/metrics）导出计数器、直方图和仪表盘指标，不依赖 prometheus_client。
+热路径上的记录只是一次加锁的计数（直方图先二分查找桶）；与摄像头管线状态相关的指标
+（各阶段耗时、丢帧、子进程数、日志队列深度等）在抓取时通过回调函数读取，不在热路径上维护
+"""
+import math
+import threading
+from bisect import bisect_left
+
+# 默认直方图桶上限（秒）：覆盖从亚毫秒级的区域判断到秒级的推理/MQTT发送
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def bucket_index(buckets, value):
+    """值所在的桶序号（len(buckets) 表示 +Inf 桶）"""
+    return bisect_left(buckets, value)
+
+
+def format_value(value):
+    """指标值的文本格式"""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labelnames, labels, extra=None):
+    """标签的文本格式，例如 {camera="cam1",stage="read"}"""
+    pairs = list(zip(labelnames, labels))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render_histogram(lines, name, labelnames, labels, buckets, counts, total):
+    """写入一组直方图样本（counts 为各桶的非累计次数，最后一项为 +Inf 桶）"""
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{format_labels(labelnames, labels, ('le', format_value(float(bound))))} {cumulative}")
+    cumulative += counts[len(buckets)]
+    lines.append(f"{name}_bucket{format_labels(labelnames, labels, ('le', '+Inf'))} {cumulative}")
+    lines.append(f"{name}_sum{format_labels(labelnames, labels)} {format_value(total)}")
+    lines.append(f"{name}_count{format_labels(labelnames, labels)} {cumulative}")
+
+
+class Counter:
+    """计数器（按标签值区分）"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # {标签值元组: 计数}
+
+    def inc(self, *labels, amount=1):
+        """计数加 amount（标签值按 labelnames 的顺序传入）"""
+        labels = tuple(str(label) for label in labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self, lines):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.append(f"# HELP {self.name} {self.documentation}")
+        lines.append(f"# TYPE {self.name} counter")
+        for labels, value in values:
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}")
+
+
+class Histogram:
+    """直方图（按标签值区分）"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # {标签值元组: [各桶次数列表, 总和]}
+
+    def observe(self, value, *labels):
+        """记录一次观测值（秒）"""
+        labels = tuple(str(label) for label in labels)
+        index = bucket_index(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self, lines):
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        lines.append(f"# HELP {self.name} {self.documentation}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for labels, counts, total in series:
+            render_histogram(lines, self.name, self.labelnames, labels, self.buckets, counts, total)
+
+
+class CallbackMetric:
+    """抓取时通过回调函数读取的指标
+
+    collect() 返回 [(标签值元组, 值)]；直方图类型返回 [(标签值元组, 桶上限, 各桶次数, 总和)]。
+    """
+
+    def __init__(self, name, documentation, metric_type, collect, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type  # counter / gauge / histogram
+        self.collect = collect
+        self.labelnames = tuple(labelnames)
+
+    def render(self, lines):
+        samples = self.collect()
+        lines.append(f"# HELP {self.name} {self.documentation}")
+        lines.append(f"# TYPE {self.name} {self.metric_type}")
+        if self.metric_type == "histogram":
+            for labels, buckets, counts, total in samples:
+                render_histogram(lines, self.name, self.labelnames, labels, buckets, counts, total)
+            return
+        for labels, value in samples:
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}")
+
+
+class MetricsRegistry:
+    """指标注册表，按注册顺序输出 Prometheus 文本格式"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(self.prefix + name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self.prefix + name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def callback(self, name, documentation, metric_type, collect, labelnames=()):
+        metric = CallbackMetric(self.prefix + name, documentation, metric_type, collect, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """所有指标的文本格式（某个指标读取失败时跳过该指标）"""
+        lines = []
+        for metric in self._metrics:
+            metric_lines = []
+            try:
+                metric.render(metric_lines)
+            except Exception as e:
+                lines.append(f"# {metric.name} 读取失败: {_escape(e)}")
+                continue
+            lines.extend(metric_lines)
+        return "\n".join(lines) + "\n"
+
+
+class ChildProcesses:
+    """跟踪服务启动的子进程（ffmpeg 解码、录制、报警视频），抓取时统计仍在运行的数量"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes = []  # [(类型, subprocess.Popen)]
+
+    def track(self, kind, process):
+        """登记一个子进程（退出后在下一次统计时移除）"""
+        if process is None:
+            return
+        with self._lock:
+            self._processes.append((kind, process))
+
+    def counts(self, kinds=()):
+        """各类型仍在运行的子进程数量（kinds 中的类型即使为0也返回）"""
+        counts = {kind: 0 for kind in kinds}
+        with self._lock:
+            self._processes = [(kind, process) for kind, process in self._processes if process.poll() is None]
+            for kind, _ in self._processes:
+                counts[kind] = counts.get(kind, 0) + 1
+        return counts
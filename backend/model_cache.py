@@ -0,0 +1,135 @@
+"""
+模型缓存模块
+按内存预算在内存中保留最近使用过的已加载、已预热的模型（LRU淘汰），
+切换到缓存中的模型时不再从磁盘加载和预热，只需替换模型引用。
+当前正在使用的模型不会被淘汰；模型文件在磁盘上被修改（重新导出）后缓存失效
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cpu_backends import model_size
+
+
+def estimate_model_memory(yolo_model, path):
+    """估算模型占用的内存（字节）：PyTorch模型按参数和缓冲区大小计算，其他格式按模型文件大小估算"""
+    module = getattr(yolo_model, 'model', None)
+    if hasattr(module, 'parameters') and hasattr(module, 'buffers'):
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    return model_size(path)
+
+
+class CachedModel:
+    """缓存中的一个模型"""
+    __slots__ = ('name', 'model', 'path', 'mtime', 'size', 'loaded_at', 'last_used', 'hits')
+
+    def __init__(self, name, model, path, size):
+        self.name = name
+        self.model = model
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.size = size  # 估算的内存占用（字节）
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.hits = 0
+
+
+class ModelCache:
+    """按内存预算保留已加载模型的LRU缓存"""
+
+    def __init__(self, budget_mb=2048):
+        self.budget = int(budget_mb * 1024 * 1024)  # 内存预算（字节），0表示只保留当前模型
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {模型名称: CachedModel}，最近使用的在末尾
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, budget_mb, pinned=None):
+        """修改内存预算，超出预算时立即淘汰，返回被淘汰的模型名称"""
+        with self._lock:
+            self.budget = int(budget_mb * 1024 * 1024)
+            return self._evict(pinned)
+
+    def get(self, name):
+        """取出缓存的模型（模型文件已修改时视为未命中），未命中返回 None"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and _mtime(entry.path) != entry.mtime:
+                # 模型文件已被替换，丢弃旧模型
+                del self._entries[name]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            entry.last_used = time.time()
+            entry.hits += 1
+            self.hits += 1
+            return entry.model
+
+    def put(self, name, model, path, pinned=None):
+        """加入（或替换）一个已加载的模型，超出预算时按LRU淘汰（pinned 为当前模型，不淘汰），返回被淘汰的模型名称"""
+        entry = CachedModel(name, model, path, estimate_model_memory(model, path))
+        with self._lock:
+            self._entries[name] = entry
+            self._entries.move_to_end(name)
+            return self._evict(pinned)
+
+    def touch(self, name):
+        """标记模型刚被使用（切换回当前模型时调用）"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+                entry.last_used = time.time()
+
+    def _evict(self, pinned):
+        evicted = []
+        total = sum(entry.size for entry in self._entries.values())
+        for name in list(self._entries):
+            if total <= self.budget:
+                break
+            if name == pinned:
+                continue
+            total -= self._entries.pop(name).size
+            evicted.append(name)
+        self.evictions += len(evicted)
+        return evicted
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._entries
+
+    def stats(self):
+        """缓存内容（按最近使用排序）和内存占用"""
+        with self._lock:
+            entries = [{
+                "name": entry.name,
+                "size_mb": round(entry.size / (1024 * 1024), 2),
+                "loaded_at": _format_time(entry.loaded_at),
+                "last_used": _format_time(entry.last_used),
+                "hits": entry.hits
+            } for entry in reversed(self._entries.values())]
+            used = sum(entry.size for entry in self._entries.values())
+            return {
+                "budget_mb": round(self.budget / (1024 * 1024), 2),
+                "used_mb": round(used / (1024 * 1024), 2),
+                "models": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
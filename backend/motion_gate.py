@@ -0,0 +1,108 @@
+"""
+运动门控模块
+大多数摄像头长时间面对静止的画面，每帧都做YOLO推理浪费算力。推理前先在缩小的灰度图上
+与滑动平均背景做差分（只统计启用区域内的像素），区域内连续若干帧没有运动时跳过推理；
+为了让静止目标仍能被重新确认，跳过推理的时间不超过设定的最大间隔
+"""
+import time
+
+import cv2
+import numpy as np
+
+
+BACKGROUND_ALPHA = 0.05  # 背景滑动平均的更新速率（越大越快适应光照变化）
+
+
+class MotionGate:
+    """单路摄像头的运动门控"""
+
+    def __init__(self):
+        self._background = None  # 背景（缩小后的灰度图，float32）
+        self._mask = None  # 缩小后的区域掩码（None表示整帧）
+        self._mask_index = None  # 掩码对应的区域索引对象
+        self._mask_area = 0
+        self._idle_frames = 0  # 连续没有运动的帧数
+        self._last_inference = 0.0  # 上次推理时间
+        self.motion_ratio = 0.0  # 最近一帧区域内运动像素的比例
+        self.inferred = 0  # 放行推理的帧数
+        self.skipped = 0  # 跳过推理的帧数
+
+    def reset(self):
+        """清空背景（分辨率变化或重新启用时调用）"""
+        self._background = None
+        self._idle_frames = 0
+
+    def _prepare(self, frame, scale_width):
+        """缩小并转为灰度图（先缩小再转换，计算量最小）"""
+        height, width = frame.shape[:2]
+        scale_width = min(int(scale_width), width)
+        scale_height = max(1, int(round(height * scale_width / width)))
+        small = cv2.resize(frame, (scale_width, scale_height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _zone_mask(self, zone_index, shape):
+        """缩小后的区域掩码（区域索引或分辨率变化时重建），没有启用区域时为整帧"""
+        if self._mask_index is zone_index and (self._mask is None or self._mask.shape == shape):
+            return self._mask
+        self._mask_index = zone_index
+        self._mask = None
+        self._mask_area = shape[0] * shape[1]
+        if zone_index is not None and zone_index.polygons and zone_index.width > 0:
+            scale = shape[1] / zone_index.width
+            mask = np.zeros(shape, np.uint8)
+            polygons = [np.round(polygon * scale).astype(np.int32) for polygon in zone_index.polygons]
+            cv2.fillPoly(mask, polygons, 255)
+            area = cv2.countNonZero(mask)
+            if area > 0:
+                self._mask = mask
+                self._mask_area = area
+        return self._mask
+
+    def should_infer(self, frame, zone_index, config):
+        """判断该帧是否需要推理
+
+        config 中使用的键：motion_scale_width（缩小后的宽度）、motion_threshold（像素差分阈值）、
+        motion_min_ratio（区域内运动像素比例阈值）、motion_idle_frames（无运动后继续推理的帧数）、
+        motion_max_skip_s（最长跳过推理的时间，秒）。
+        """
+        now = time.monotonic()
+        small = self._prepare(frame, config.get('motion_scale_width', 160))
+        if self._background is None or self._background.shape != small.shape:
+            self._background = small.astype(np.float32)
+            self._idle_frames = 0
+            return self._allow(now)
+
+        mask = self._zone_mask(zone_index, small.shape)
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self._background))
+        _, moving = cv2.threshold(diff, int(config.get('motion_threshold', 25)), 255, cv2.THRESH_BINARY)
+        if mask is not None:
+            moving = cv2.bitwise_and(moving, mask)
+        self.motion_ratio = cv2.countNonZero(moving) / max(1, self._mask_area)
+        cv2.accumulateWeighted(small, self._background, BACKGROUND_ALPHA)
+
+        if self.motion_ratio >= config.get('motion_min_ratio', 0.002):
+            self._idle_frames = 0
+            return self._allow(now)
+
+        self._idle_frames += 1
+        if self._idle_frames <= config.get('motion_idle_frames', 5):
+            return self._allow(now)
+        if now - self._last_inference >= config.get('motion_max_skip_s', 5.0):
+            # 长时间没有推理，重新确认静止目标
+            return self._allow(now)
+        self.skipped += 1
+        return False
+
+    def _allow(self, now):
+        self._last_inference = now
+        self.inferred += 1
+        return True
+
+    def stats(self):
+        """放行/跳过帧数和最近一帧的运动比例"""
+        return {
+            "inferred": self.inferred,
+            "skipped": self.skipped,
+            "motion_ratio": round(self.motion_ratio, 4)
+        }
@@ -0,0 +1,124 @@
+"""
+推理速率控制模块
+每路摄像头有一个目标推理帧率（0表示不限），所有摄像头共享同一个推理能力预算：
+根据实测的单帧推理耗时估算每秒可推理的帧数（乘以最大利用率），再按最大最小公平原则分配给
+各路活跃摄像头——目标帧率低于平均份额的摄像头按目标帧率，剩余的能力由其他摄像头平分。
+检测线程每次推理前等待自己的时间片，到点后再取最新帧，因此不会有某一路占满全部算力
+"""
+import threading
+import time
+
+
+class RateBudget:
+    """多路摄像头共享的推理能力预算"""
+
+    def __init__(self, cost_fn, max_utilization=0.9, adaptive=True, active_window=2.0):
+        self.cost_fn = cost_fn  # 返回当前单帧推理耗时（秒），未知时返回0
+        self.max_utilization = max_utilization  # 推理最多占用的算力比例
+        self.adaptive = adaptive  # 是否按推理耗时和摄像头数量自动降低帧率
+        self.active_window = active_window  # 该时长内请求过时间片的摄像头视为活跃
+        self._lock = threading.Lock()
+        self._controllers = {}  # {camera_id: RateController}
+
+    def configure(self, max_utilization=None, adaptive=None):
+        with self._lock:
+            if max_utilization is not None:
+                self.max_utilization = float(max_utilization)
+            if adaptive is not None:
+                self.adaptive = bool(adaptive)
+
+    def add(self, controller):
+        with self._lock:
+            self._controllers[controller.camera_id] = controller
+
+    def remove(self, controller):
+        with self._lock:
+            if self._controllers.get(controller.camera_id) is controller:
+                del self._controllers[controller.camera_id]
+
+    def capacity(self):
+        """每秒可推理的帧数（按最大利用率计算），推理耗时未知时为不限"""
+        cost = self.cost_fn()
+        if not cost or cost <= 0:
+            return float('inf')
+        return self.max_utilization / cost
+
+    def allocate(self):
+        """按最大最小公平原则分配各活跃摄像头的帧率上限，返回 {camera_id: 帧率上限}"""
+        now = time.monotonic()
+        with self._lock:
+            adaptive = self.adaptive
+            active = [c for c in self._controllers.values() if now - c.last_request <= self.active_window]
+        demands = sorted((c.target_fps or float('inf'), c.camera_id) for c in active)
+        if not adaptive:
+            return {camera_id: demand for demand, camera_id in demands}
+
+        remaining = self.capacity()
+        limits = {}
+        for i, (demand, camera_id) in enumerate(demands):
+            share = remaining / (len(demands) - i)
+            limits[camera_id] = min(demand, share)
+            remaining -= limits[camera_id]
+        return limits
+
+
+class RateController:
+    """单路摄像头的推理速率控制器"""
+
+    def __init__(self, camera_id, budget, target_fps=0.0):
+        self.camera_id = camera_id
+        self.budget = budget
+        self.target_fps = float(target_fps)  # 目标推理帧率（0表示不限）
+        self.limit_fps = float('inf')  # 当前生效的帧率上限
+        self.last_request = 0.0  # 最近一次请求时间片的时间
+        self._next_time = 0.0  # 下一次允许推理的时间
+        self._latency = 0.0  # 推理耗时（指数滑动平均，秒）
+        self._interval = 0.0  # 实际推理间隔（指数滑动平均，秒）
+        self._last_start = 0.0
+
+    def open(self):
+        """加入推理能力预算（摄像头管线启动时调用）"""
+        self.budget.add(self)
+
+    def wait_turn(self, stop_event):
+        """等待下一个推理时间片，被停止时返回False"""
+        self.last_request = time.monotonic()
+        self.limit_fps = self.budget.allocate().get(self.camera_id, float('inf'))
+        delay = self._next_time - time.monotonic()
+        if delay > 0 and stop_event.wait(delay):
+            return False
+
+        now = time.monotonic()
+        if self._last_start:
+            self._interval = _ema(self._interval, now - self._last_start)
+        self._last_start = now
+        if self.limit_fps == float('inf') or self.limit_fps <= 0:
+            self._next_time = now
+        else:
+            # 以计划时间为基准推进，避免误差累积；落后超过一个间隔时从当前时间重新开始
+            interval = 1.0 / self.limit_fps
+            base = self._next_time if now - self._next_time < interval else now
+            self._next_time = base + interval
+        return True
+
+    def record(self, latency):
+        """记录一次推理耗时（秒）"""
+        self._latency = _ema(self._latency, latency)
+
+    def close(self):
+        """退出推理能力预算（摄像头管线停止时调用）"""
+        self.budget.remove(self)
+
+    def stats(self):
+        """目标帧率、当前帧率上限、实测推理帧率和推理耗时"""
+        return {
+            "target_fps": self.target_fps,
+            "limit_fps": None if self.limit_fps == float('inf') else round(self.limit_fps, 2),
+            "measured_fps": round(1.0 / self._interval, 2) if self._interval > 0 else 0.0,
+            "inference_ms": round(self._latency * 1000, 2)
+        }
+
+
+def _ema(current, value, alpha=0.2):
+    """指数滑动平均（首个值直接使用）"""
+    return value if current <= 0 else current + alpha * (value - current)
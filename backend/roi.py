@@ -0,0 +1,95 @@
+"""
+区域裁剪推理模块
+报警只关心区域内的目标，因此可以只对启用区域的外接矩形（加上边距）做检测：
+各区域的外接矩形合并为不超过指定数量的裁剪区域，每个裁剪区域作为一张图送入模型，
+检测框再平移回整帧坐标后交给跟踪器（跟踪器始终工作在整帧坐标系中）。
+区域越小、分辨率越高，节省的推理量越多，同时小目标在相同 imgsz 下被放大，更容易检出
+"""
+import numpy as np
+
+
+MIN_CROP_SIZE = 320  # 裁剪区域的最小边长（过小的区域缺少上下文，检测效果差）
+FULL_FRAME_RATIO = 0.8  # 裁剪区域总面积超过整帧的该比例时，直接整帧推理
+
+
+def _area(rect):
+    return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _expand(rect, min_size, width, height):
+    """把过小的矩形以中心为基准扩大到最小边长（限制在画面内）"""
+    x0, y0, x1, y1 = rect
+    if x1 - x0 < min_size:
+        cx = (x0 + x1) // 2
+        x0 = max(0, min(width - min_size, cx - min_size // 2))
+        x1 = min(width, x0 + min_size)
+    if y1 - y0 < min_size:
+        cy = (y0 + y1) // 2
+        y0 = max(0, min(height - min_size, cy - min_size // 2))
+        y1 = min(height, y0 + min_size)
+    return (x0, y0, x1, y1)
+
+
+def compute_crops(polygons, width, height, padding=64, max_crops=1):
+    """计算区域裁剪推理使用的裁剪区域
+
+    返回 [(x0, y0, x1, y1), ...]（整帧像素坐标，互不重叠）；
+    没有区域、或裁剪区域接近整帧时返回空列表，表示整帧推理。
+    """
+    if not polygons or width <= 0 or height <= 0:
+        return []
+
+    rects = []
+    for polygon in polygons:
+        points = np.asarray(polygon).reshape(-1, 2)
+        x0 = max(0, int(points[:, 0].min()) - padding)
+        y0 = max(0, int(points[:, 1].min()) - padding)
+        x1 = min(width, int(points[:, 0].max()) + padding + 1)
+        y1 = min(height, int(points[:, 1].max()) + padding + 1)
+        if x0 < x1 and y0 < y1:
+            rects.append(_expand((x0, y0, x1, y1), MIN_CROP_SIZE, width, height))
+    if not rects:
+        return []
+
+    # 合并相互重叠的矩形，再按合并后面积增加最少的原则合并到不超过 max_crops 个
+    # （合并后可能与其他矩形重叠，因此循环直到没有重叠且数量满足要求）
+    max_crops = max(1, int(max_crops))
+    while True:
+        pair = None
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                if _overlaps(rects[i], rects[j]):
+                    pair = (i, j)
+                    break
+            if pair:
+                break
+        if pair is None and len(rects) > max_crops:
+            best = None
+            for i in range(len(rects)):
+                for j in range(i + 1, len(rects)):
+                    cost = _area(_union(rects[i], rects[j])) - _area(rects[i]) - _area(rects[j])
+                    if best is None or cost < best[0]:
+                        best = (cost, i, j)
+            pair = best[1:]
+        if pair is None:
+            break
+        i, j = pair
+        merged = _union(rects[i], rects[j])
+        rects = [rect for k, rect in enumerate(rects) if k not in (i, j)] + [merged]
+
+    if sum(_area(rect) for rect in rects) >= FULL_FRAME_RATIO * width * height:
+        return []
+    return sorted(rects, key=lambda rect: (rect[1], rect[0]))
+
+
+def crop_frames(frame, crops):
+    """按裁剪区域切出子图（numpy视图，不复制）"""
+    return [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in crops]
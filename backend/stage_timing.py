@@ -0,0 +1,81 @@
+"""
+阶段耗时统计模块
+记录检测流水线各阶段（读取、推理、跟踪、区域判断、报警、绘制、编码、推送）每一帧的耗时，
+每个阶段保留最近的若干个样本用于计算分位数，同时累计直方图各桶的次数；记录一次只是一次加锁追加，几乎没有开销。
+/api/status、/metrics 和离线回放测试工具（tools/benchmark.py）使用这些统计
+"""
+import threading
+from collections import deque
+
+import numpy as np
+
+from metrics import DEFAULT_BUCKETS, bucket_index
+
+
+DEFAULT_MAX_SAMPLES = 2048  # 每个阶段保留的最近样本数
+
+
+class StageTimings:
+    """各阶段耗时统计"""
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES, buckets=DEFAULT_BUCKETS):
+        self.max_samples = max_samples
+        self.buckets = tuple(buckets)  # 直方图桶上限（秒）
+        self._lock = threading.Lock()
+        self._samples = {}  # {阶段: deque(耗时秒数)}
+        self._counts = {}  # {阶段: 累计次数}
+        self._totals = {}  # {阶段: 累计耗时（秒）}
+        self._histograms = {}  # {阶段: 各桶累计次数（非累加，最后一项为 +Inf 桶）}
+
+    def record(self, stage, seconds):
+        """记录一次阶段耗时（秒）"""
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.max_samples)
+                self._counts[stage] = 0
+                self._totals[stage] = 0.0
+                self._histograms[stage] = [0] * (len(self.buckets) + 1)
+            samples.append(seconds)
+            self._counts[stage] += 1
+            self._totals[stage] += seconds
+            self._histograms[stage][bucket_index(self.buckets, seconds)] += 1
+
+    def count(self, stage):
+        """阶段的累计次数"""
+        with self._lock:
+            return self._counts.get(stage, 0)
+
+    def reset(self, max_samples=None):
+        """清空统计（可同时修改保留的样本数）"""
+        with self._lock:
+            if max_samples is not None:
+                self.max_samples = max_samples
+            self._samples = {}
+            self._counts = {}
+            self._totals = {}
+            self._histograms = {}
+
+    def histograms(self):
+        """各阶段的直方图 {阶段: (各桶次数, 累计耗时秒数)}（自启动或上次清空以来的全部样本）"""
+        with self._lock:
+            return {stage: (list(counts), self._totals[stage]) for stage, counts in self._histograms.items()}
+
+    def summary(self):
+        """各阶段的次数、平均耗时和 P50/P95/P99/最大耗时（毫秒，分位数按最近的样本计算）"""
+        with self._lock:
+            snapshot = {stage: (list(samples), self._counts[stage], self._totals[stage])
+                        for stage, samples in self._samples.items()}
+        summary = {}
+        for stage, (samples, count, total) in snapshot.items():
+            values = np.asarray(samples) * 1000
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            summary[stage] = {
+                "count": count,
+                "mean_ms": round(total * 1000 / count, 3),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(values.max()), 3)
+            }
+        return summary
@@ -0,0 +1,83 @@
+"""
+启动阶段模块
+服务启动分为多个阶段：配置加载和Web服务立即完成，GPU检测、模型加载和预热在后台线程中进行。
+记录每个阶段的状态和耗时，供 /api/ready 区分"正在启动"和"启动失败"
+"""
+import threading
+import time
+
+
+class StartupPhases:
+    """按顺序记录各启动阶段的状态（pending / running / done / failed）和耗时"""
+
+    def __init__(self, names):
+        self._lock = threading.Lock()
+        self._start_time = time.time()
+        self._phases = {name: {"name": name, "status": "pending", "started_at": None,
+                               "duration_ms": None, "error": None} for name in names}
+
+    def begin(self, name):
+        """阶段开始"""
+        with self._lock:
+            phase = self._phases[name]
+            phase["status"] = "running"
+            phase["started_at"] = time.time()
+
+    def end(self, name, error=None):
+        """阶段结束（error 不为空表示失败）"""
+        with self._lock:
+            phase = self._phases[name]
+            if phase["started_at"] is None:
+                phase["started_at"] = self._start_time
+            phase["duration_ms"] = round((time.time() - phase["started_at"]) * 1000, 1)
+            phase["status"] = "failed" if error else "done"
+            phase["error"] = str(error) if error else None
+
+    def run(self, name, func, *args, **kwargs):
+        """执行一个阶段并记录耗时，失败时记录错误并重新抛出异常"""
+        self.begin(name)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.end(name, error=e)
+            raise
+        self.end(name)
+        return result
+
+    def mark_done(self, name):
+        """在阶段之外完成了该阶段的工作（例如启动加载模型失败后手动加载成功），未完成的阶段标记为完成"""
+        with self._lock:
+            phase = self._phases[name]
+            if phase["status"] == "done":
+                return
+            if phase["started_at"] is None:
+                phase["started_at"] = time.time()
+                phase["duration_ms"] = 0.0
+            phase["status"] = "done"
+            phase["error"] = None
+
+    def is_done(self, name):
+        with self._lock:
+            return self._phases[name]["status"] == "done"
+
+    def in_progress(self):
+        """是否仍在启动（没有阶段失败，且还有阶段未完成）"""
+        return self.report()["status"] == "starting"
+
+    def report(self):
+        """整体状态（starting / ready / failed）和各阶段详情"""
+        with self._lock:
+            phases = [dict(phase) for phase in self._phases.values()]
+        statuses = {phase["status"] for phase in phases}
+        if "failed" in statuses:
+            status = "failed"
+        elif statuses == {"done"}:
+            status = "ready"
+        else:
+            status = "starting"
+        return {
+            "status": status,
+            "ready": status == "ready",
+            "uptime_s": round(time.time() - self._start_time, 1),
+            "phases": phases
+        }
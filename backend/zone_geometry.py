@@ -0,0 +1,143 @@
+"""
+区域几何计算模块
+一次性计算一帧中所有检测框与所有启用区域的归属关系（检测框 × 区域 的布尔矩阵），
+报警、绘制和WebSocket推送都读取同一个矩阵，不再逐框逐区域调用 cv2.pointPolygonTest。
+中心点模式下使用按分辨率栅格化的区域标签图（每个像素的第k位表示是否在第k个区域内），
+判断只需一次数组索引
+"""
+import cv2
+import numpy as np
+
+
+# 标签图位宽：区域数量不超过位宽时使用对应的整数类型，超过64个区域时退回多边形计算
+LABEL_MAP_DTYPES = ((8, np.uint8), (16, np.uint16), (32, np.uint32), (64, np.uint64))
+
+
+def enabled_zones_of(zones):
+    """启用且至少有3个顶点的区域"""
+    return [z for z in zones if z.get('enabled', True) and len(z.get('points', [])) >= 3]
+
+
+class ZoneIndex:
+    """一组启用区域的多边形索引
+
+    所有区域的边拼接为一个数组，点是否在多边形内（射线法，边界上视为在内部，
+    与 cv2.pointPolygonTest(...) >= 0 一致）对所有点、所有边一次向量化计算，
+    再通过边到区域的映射矩阵汇总为 点 × 区域 的结果。
+    指定了分辨率时，中心点模式使用栅格化的区域标签图（首次使用时生成）。
+    """
+
+    def __init__(self, zones, width=0, height=0):
+        self.zones = enabled_zones_of(zones)
+        self.width = width
+        self.height = height
+        self._label_map = None
+        self._label_map_built = False
+        # 与原实现一致：顶点坐标取整
+        self.polygons = [np.array(zone['points'], np.int32) for zone in self.zones]
+
+        if self.polygons:
+            starts = np.concatenate(self.polygons).astype(np.float64)
+            ends = np.concatenate([np.roll(polygon, -1, axis=0) for polygon in self.polygons]).astype(np.float64)
+            edge_zone = np.repeat(np.arange(len(self.polygons)), [len(polygon) for polygon in self.polygons])
+        else:
+            starts = ends = np.empty((0, 2), np.float64)
+            edge_zone = np.empty(0, np.int64)
+        self._x1, self._y1 = starts[:, 0], starts[:, 1]
+        self._x2, self._y2 = ends[:, 0], ends[:, 1]
+        self._min_x, self._max_x = np.minimum(self._x1, self._x2), np.maximum(self._x1, self._x2)
+        self._min_y, self._max_y = np.minimum(self._y1, self._y2), np.maximum(self._y1, self._y2)
+        # 边 → 区域 的映射矩阵（E × Z），用于按区域汇总
+        self._edge_zone = np.zeros((len(edge_zone), len(self.polygons)), np.int32)
+        self._edge_zone[np.arange(len(edge_zone)), edge_zone] = 1
+
+    def __len__(self):
+        return len(self.zones)
+
+    @property
+    def label_map(self):
+        """区域标签图（H × W，第k位为1表示该像素在第k个区域内），无法生成时为None"""
+        if not self._label_map_built:
+            self._label_map = self._build_label_map()
+            self._label_map_built = True
+        return self._label_map
+
+    def _build_label_map(self):
+        """按当前分辨率栅格化所有区域"""
+        if not self.zones or self.width <= 0 or self.height <= 0:
+            return None
+        dtype = next((dtype for bits, dtype in LABEL_MAP_DTYPES if len(self.zones) <= bits), None)
+        if dtype is None:
+            return None
+
+        label_map = np.zeros((self.height, self.width), dtype)
+        mask = np.zeros((self.height, self.width), np.uint8)
+        for bit, polygon in enumerate(self.polygons):
+            mask[:] = 0
+            cv2.fillPoly(mask, [polygon], 1)
+            label_map[mask.astype(bool)] |= dtype(1) << dtype(bit)
+        return label_map
+
+    def lookup(self, points):
+        """通过标签图查询 点 × 区域 的布尔矩阵（像素精度），没有标签图时返回None"""
+        label_map = self.label_map
+        if label_map is None:
+            return None
+        points = np.asarray(points, np.float64).reshape(-1, 2)
+        xs = np.clip(points[:, 0].astype(np.int64), 0, self.width - 1)
+        ys = np.clip(points[:, 1].astype(np.int64), 0, self.height - 1)
+        labels = label_map[ys, xs]
+        bits = np.arange(len(self.zones), dtype=label_map.dtype)
+        return ((labels[:, None] >> bits) & 1).astype(bool)
+
+    def points_in_zones(self, points):
+        """点 × 区域 的布尔矩阵（points 形状为 (P, 2)）"""
+        points = np.asarray(points, np.float64).reshape(-1, 2)
+        if len(points) == 0 or not self.zones:
+            return np.zeros((len(points), len(self.zones)), bool)
+
+        px, py = points[:, 0:1], points[:, 1:2]
+        x1, y1, x2, y2 = self._x1, self._y1, self._x2, self._y2
+
+        # 射线法：统计向右的水平射线与各条边的交点数
+        straddle = (y1 > py) != (y2 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        crossings = straddle & (px < x_cross)
+
+        # 落在边上的点视为在区域内
+        cross = (x2 - x1) * (py - y1) - (y2 - y1) * (px - x1)
+        on_edge = ((cross == 0) & (px >= self._min_x) & (px <= self._max_x)
+                   & (py >= self._min_y) & (py <= self._max_y))
+
+        counts = crossings.astype(np.int32) @ self._edge_zone
+        touches = on_edge.astype(np.int32) @ self._edge_zone
+        return (counts % 2 == 1) | (touches > 0)
+
+    def membership(self, xyxy, mode='center'):
+        """检测框 × 区域 的布尔矩阵
+
+        mode 为 center 时判断检测框中心点；为 edge 时四个角点或中心点任一在区域内即视为进入。
+        """
+        xyxy = np.asarray(xyxy, np.float64).reshape(-1, 4)
+        count = len(xyxy)
+        if count == 0 or not self.zones:
+            return np.zeros((count, len(self.zones)), bool)
+
+        x1, y1, x2, y2 = xyxy[:, 0], xyxy[:, 1], xyxy[:, 2], xyxy[:, 3]
+        centers = np.stack([(x1 + x2) / 2, (y1 + y2) / 2], axis=1)
+        if mode == 'center':
+            inside = self.lookup(centers)
+            return inside if inside is not None else self.points_in_zones(centers)
+        if mode == 'edge':
+            corners = [np.stack(corner, axis=1) for corner in ((x1, y1), (x2, y1), (x2, y2), (x1, y2))]
+            inside = self.points_in_zones(np.concatenate(corners + [centers]))
+            return inside.reshape(5, count, len(self.zones)).any(axis=0)
+        return np.zeros((count, len(self.zones)), bool)
+
+
+def first_zone_indices(membership):
+    """每个检测框命中的第一个区域下标（未命中为-1）"""
+    if membership.shape[1] == 0:
+        return np.full(membership.shape[0], -1, np.int64)
+    return np.where(membership.any(axis=1), membership.argmax(axis=1), -1)
@@ -0,0 +1,405 @@
+"""
+离线回放性能测试工具
+把录制好的视频文件（或目录中的所有视频，每个视频作为一路摄像头）送入与线上完全相同的处理路径：
+读取 → 推理/跟踪 → 区域判断/报警 → 绘制 → 编码 → WebSocket推送，统计各阶段耗时分位数、端到端帧率、
+CPU占用和内存（RSS），并写入JSON报告，不同提交的报告可以直接对比，在部署到现场之前发现性能退化。
+
+测试在独立的临时配置目录中进行（不会修改 config/ 中的配置），报警只保存图片（不录制报警视频），
+不连接MQTT；推送使用进程内的 Socket.IO 测试客户端订阅各路摄像头。
+
+两种模式：
+- realtime：按视频帧率读取（与接入真实摄像头时的负载一致），关注延迟和丢帧
+- fast：尽快读取，关注处理能力上限（读取比处理快时中间帧会被丢弃，与线上行为一致）
+
+用法：
+    # 两种模式各测一遍，写入报告
+    python tools/benchmark.py videos/demo.mp4 --output reports/demo.json
+
+    # 用目录中的多个视频模拟多路摄像头，指定模型和现场的配置文件
+    python tools/benchmark.py videos/ --mode fast --model yolo26m_640_int8.engine --config-dir config/
+
+    # 对比两次测试的报告
+    python tools/benchmark.py --compare reports/before.json reports/after.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov')
+MODES = ("realtime", "fast")
+# 从 --config-dir 复制的配置文件（摄像头、区域、报警、MQTT配置由测试工具生成）
+COPIED_CONFIGS = ("classes_config.json", "display_config.json", "inference_config.json",
+                  "occlusion_config.json", "model_classes.json", "alarm_config.json")
+
+
+def list_videos(source):
+    """视频文件列表（目录时按文件名排序）"""
+    if os.path.isdir(source):
+        videos = sorted(os.path.join(source, name) for name in os.listdir(source)
+                        if name.lower().endswith(VIDEO_EXTENSIONS))
+        if not videos:
+            raise FileNotFoundError(f"目录中没有视频文件: {source}")
+        return videos
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"视频文件不存在: {source}")
+    return [source]
+
+
+def probe_video(path):
+    """读取视频的分辨率、帧率和帧数"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频: {path}")
+    info = {
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": cap.get(cv2.CAP_PROP_FPS) or 25.0,
+        "frames": int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    }
+    cap.release()
+    return info
+
+
+def default_zones(width, height):
+    """默认区域：画面中央 60% 的矩形（保证区域判断、报警和区域绘制都被执行）"""
+    x0, y0, x1, y1 = width * 0.2, height * 0.2, width * 0.8, height * 0.8
+    return [{
+        "id": "zone_1",
+        "name": "测试区域",
+        "points": [[x0, y0], [x1, y0], [x1, y1], [x0, y1]],
+        "enabled": True,
+        "resolution": [width, height]
+    }]
+
+
+def prepare_config_dir(args, videos, mode):
+    """生成临时配置目录：每个视频一路摄像头，报警只保存图片、不连接MQTT"""
+    config_dir = tempfile.mkdtemp(prefix="alarm_benchmark_")
+    if args.config_dir:
+        for name in COPIED_CONFIGS:
+            path = os.path.join(args.config_dir, name)
+            if os.path.exists(path):
+                shutil.copy(path, config_dir)
+
+    model_name = args.model
+    if not model_name:
+        system_config = os.path.join(args.config_dir or os.path.join(BASE_DIR, 'config'), "system_config.json")
+        if os.path.exists(system_config):
+            with open(system_config, 'r') as f:
+                model_name = json.load(f).get('model')
+
+    cameras, zones = [], {}
+    custom_zones = None
+    if args.zones:
+        with open(args.zones, 'r', encoding='utf-8') as f:
+            custom_zones = json.load(f)
+    for i, video in enumerate(videos, 1):
+        camera_id = f"replay{i}"
+        info = probe_video(video)
+        cameras.append({
+            "id": camera_id,
+            "name": os.path.basename(video),
+            "video_url": os.path.abspath(video),
+            "decoder": {"backend": args.decoder, "realtime": mode == "realtime"}
+        })
+        zones[camera_id] = json.loads(json.dumps(custom_zones)) if custom_zones else \
+            default_zones(info["width"], info["height"])
+
+    alarm_config = {}
+    alarm_path = os.path.join(config_dir, "alarm_config.json")
+    if os.path.exists(alarm_path):
+        with open(alarm_path, 'r', encoding='utf-8') as f:
+            alarm_config = json.load(f)
+    alarm_config.update(save_event_video=False, event_save_path=os.path.join(config_dir, "alarm_events"))
+
+    files = {
+        "system_config.json": dict({"cameras": cameras}, **({"model": model_name} if model_name else {})),
+        "zones_config.json": {"cameras": zones},
+        "alarm_config.json": alarm_config,
+        "mqtt_config.json": {"enabled": False}
+    }
+    for name, content in files.items():
+        with open(os.path.join(config_dir, name), 'w', encoding='utf-8') as f:
+            json.dump(content, f, indent=2, ensure_ascii=False)
+    return config_dir
+
+
+def current_rss_mb():
+    """当前进程的常驻内存（MB），无法读取 /proc 时使用峰值"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_replay(args, mode):
+    """在当前进程中用指定模式回放一遍，返回该模式的测试结果"""
+    videos = list_videos(args.source)
+    config_dir = prepare_config_dir(args, videos, mode)
+    os.environ["ALARM_CONFIG_DIR"] = config_dir
+    os.environ["ALARM_AUTOSTART_CAMERAS"] = "false"
+    sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+    import server
+
+    print(f"[{mode}] 等待模型加载和预热...")
+    deadline = time.monotonic() + args.startup_timeout
+    while True:
+        report = server.startup_phases.report()
+        if report["status"] == "ready":
+            break
+        if report["status"] == "failed" or time.monotonic() > deadline:
+            raise RuntimeError(f"服务启动失败: {report['phases']}")
+        time.sleep(0.2)
+
+    pipelines = server.get_all_pipelines()
+    infos = {pipeline.camera_id: probe_video(pipeline.video_path) for pipeline in pipelines}
+    for pipeline in pipelines:
+        pipeline.timings.reset(max_samples=args.max_samples)
+        pipeline.latency.reset(max_samples=args.max_samples)
+
+    # 进程内的 Socket.IO 客户端订阅所有摄像头（与浏览器客户端走相同的绘制、编码和推送路径）
+    client = server.socketio.test_client(server.app)
+    for pipeline in pipelines:
+        client.emit('subscribe', {"camera_id": pipeline.camera_id, "frame_format": args.frame_format,
+                                  "exclusive": False})
+    client.get_received()
+    received = {pipeline.camera_id: 0 for pipeline in pipelines}
+
+    # 一遍播放完（或达到 --duration）即停止，最长不超过视频时长的2倍加60秒
+    playback = max(info["frames"] / info["fps"] for info in infos.values())
+    limit = args.duration or (playback * 2 + 60)
+    print(f"[{mode}] 开始回放 {len(pipelines)} 路视频（视频时长 {playback:.1f} 秒）")
+
+    usage_start = resource.getrusage(resource.RUSAGE_SELF)
+    rss_start = rss_peak = current_rss_mb()
+    start = time.monotonic()
+    for pipeline in pipelines:
+        pipeline.start()
+
+    while True:
+        time.sleep(0.5)
+        for packet in client.get_received():
+            if packet.get("name") == "frame" and packet.get("args"):
+                camera_id = packet["args"][0].get("camera_id")
+                if camera_id in received:
+                    received[camera_id] += 1
+        rss_peak = max(rss_peak, current_rss_mb())
+        elapsed = time.monotonic() - start
+        # 帧数未知的视频只能按时长结束
+        finished = all(pipeline.frame_slot.seq >= (infos[pipeline.camera_id]["frames"] or float('inf'))
+                       for pipeline in pipelines)
+        if (finished and not args.duration) or elapsed >= limit:
+            break
+
+    wall = time.monotonic() - start
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    for pipeline in pipelines:
+        pipeline.stop()
+    client.disconnect()
+
+    cpu_user = usage_end.ru_utime - usage_start.ru_utime
+    cpu_system = usage_end.ru_stime - usage_start.ru_stime
+    cameras = []
+    for pipeline in pipelines:
+        timings = pipeline.timings
+        frames = {
+            "read": pipeline.frame_slot.seq,
+            "inferred": timings.count("inference"),
+            "processed": timings.count("zone"),
+            "emitted": timings.count("emit"),
+            "received": received[pipeline.camera_id]
+        }
+        cameras.append({
+            "camera_id": pipeline.camera_id,
+            "video": pipeline.name,
+            "video_info": infos[pipeline.camera_id],
+            "frames": frames,
+            "fps": {key: round(value / wall, 2) for key, value in frames.items()},
+            "stages": timings.summary(),
+            "latency": pipeline.latency.summary(),
+            "handoffs": {name: stage.stats() for name, stage in pipeline.stages.items()},
+            "annotation": dict(pipeline.annotation_stats),
+            "rate": pipeline.rate.stats()
+        })
+
+    total_processed = sum(camera["frames"]["processed"] for camera in cameras)
+    return {
+        "mode": mode,
+        "model": server.current_model_name,
+        "device": str(server.device),
+        "frame_format": args.frame_format,
+        "duration_s": round(wall, 2),
+        "end_to_end_fps": round(total_processed / wall, 2),
+        "cpu": {
+            "user_s": round(cpu_user, 2),
+            "system_s": round(cpu_system, 2),
+            "percent": round((cpu_user + cpu_system) / wall * 100, 1)  # 相对单个核心，多核时可超过100
+        },
+        "memory": {
+            "rss_start_mb": round(rss_start, 1),
+            "rss_peak_mb": round(rss_peak, 1),
+            "rss_end_mb": round(current_rss_mb(), 1)
+        },
+        "inference": server.inference_scheduler.report(),
+        "inference_config": dict(server.inference_config),
+        "cameras": cameras
+    }
+
+
+def run_modes(args, modes):
+    """每种模式在独立的子进程中运行（服务模块的全局状态只能初始化一次），合并结果"""
+    runs = {}
+    for mode in modes:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            result_path = f.name
+        command = [sys.executable, os.path.abspath(__file__), args.source, "--mode", mode,
+                   "--single-run", result_path, "--frame-format", args.frame_format,
+                   "--decoder", args.decoder, "--max-samples", str(args.max_samples),
+                   "--startup-timeout", str(args.startup_timeout)]
+        for option in ("model", "zones", "config_dir", "duration"):
+            value = getattr(args, option)
+            if value:
+                command += [f"--{option.replace('_', '-')}", str(value)]
+        subprocess.run(command, check=True)
+        with open(result_path, 'r', encoding='utf-8') as f:
+            runs[mode] = json.load(f)
+        os.remove(result_path)
+    return runs
+
+
+def print_run(run):
+    print(f"\n[{run['mode']}] 模型 {run['model']}（{run['device']}），时长 {run['duration_s']} 秒，"
+          f"端到端 {run['end_to_end_fps']} FPS，CPU {run['cpu']['percent']}%，"
+          f"内存峰值 {run['memory']['rss_peak_mb']} MB")
+    for camera in run["cameras"]:
+        frames = camera["frames"]
+        print(f"  {camera['video']}: 读取 {frames['read']} 帧，推理 {frames['inferred']} 帧，"
+              f"推送 {frames['emitted']} 帧（{camera['fps']['emitted']} FPS）")
+        for stage, stats in list(camera["stages"].items()) + list(camera.get("latency", {}).items()):
+            print(f"    {stage:<10} 次数 {stats['count']:>6}  平均 {stats['mean_ms']:>8.2f} ms  "
+                  f"P50 {stats['p50_ms']:>8.2f} ms  P95 {stats['p95_ms']:>8.2f} ms  P99 {stats['p99_ms']:>8.2f} ms")
+
+
+def compare_reports(old_path, new_path):
+    """对比两份报告：各模式的端到端帧率、CPU、内存和各阶段 P50/P95 的变化"""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"对比: {old.get('commit')} -> {new.get('commit')}")
+
+    def delta(before, after):
+        if not before:
+            return f"{before} -> {after}"
+        return f"{before} -> {after} ({(after - before) / before * 100:+.1f}%)"
+
+    for mode, new_run in new["runs"].items():
+        old_run = old["runs"].get(mode)
+        if old_run is None:
+            continue
+        print(f"\n[{mode}]")
+        print(f"  端到端FPS: {delta(old_run['end_to_end_fps'], new_run['end_to_end_fps'])}")
+        print(f"  CPU%:      {delta(old_run['cpu']['percent'], new_run['cpu']['percent'])}")
+        print(f"  内存峰值MB: {delta(old_run['memory']['rss_peak_mb'], new_run['memory']['rss_peak_mb'])}")
+        old_cameras = {camera["video"]: camera for camera in old_run["cameras"]}
+        for camera in new_run["cameras"]:
+            old_camera = old_cameras.get(camera["video"])
+            if old_camera is None:
+                continue
+            print(f"  {camera['video']}:")
+            for group in ("stages", "latency"):
+                for stage, stats in camera.get(group, {}).items():
+                    old_stats = old_camera.get(group, {}).get(stage)
+                    if old_stats is None:
+                        continue
+                    print(f"    {stage:<10} P50 {delta(old_stats['p50_ms'], stats['p50_ms'])}, "
+                          f"P95 {delta(old_stats['p95_ms'], stats['p95_ms'])}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="用录制的视频离线回放检测流水线并统计性能")
+    parser.add_argument("source", nargs="?", help="视频文件或视频目录（目录中每个视频作为一路摄像头）")
+    parser.add_argument("--mode", choices=list(MODES) + ["both"], default="both", help="回放模式（默认两种都测）")
+    parser.add_argument("--model", default=None, help="使用的模型（默认使用系统配置中的模型）")
+    parser.add_argument("--zones", default=None, help="区域配置JSON文件（区域列表，应用到每路摄像头；默认画面中央60%%的矩形）")
+    parser.add_argument("--config-dir", default=None, help="复制该目录中的类别、显示、推理、报警等配置（例如现场的 config/）")
+    parser.add_argument("--decoder", choices=["opencv", "ffmpeg"], default="opencv", help="解码方式（默认 opencv）")
+    parser.add_argument("--frame-format", choices=["binary", "base64", "none"], default="binary",
+                        help="推送的图像格式（none 时不绘制和编码画面）")
+    parser.add_argument("--duration", type=float, default=0, help="测试时长（秒，默认播放一遍）")
+    parser.add_argument("--max-samples", type=int, default=100000, help="每个阶段保留的耗时样本数")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="等待模型加载的最长时间（秒）")
+    parser.add_argument("--output", default=None, help="JSON报告输出路径")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="对比两份报告")
+    parser.add_argument("--single-run", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if not args.compare and not args.source:
+        parser.error("需要指定视频文件或目录")
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.compare:
+        compare_reports(*args.compare)
+        return 0
+
+    if args.single_run:
+        # 子进程：只运行一种模式，结果写入父进程指定的文件
+        result = run_replay(args, args.mode)
+        with open(args.single_run, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        shutil.rmtree(os.environ["ALARM_CONFIG_DIR"], ignore_errors=True)
+        sys.stdout.flush()
+        os._exit(0)  # 不等待服务的后台线程
+
+    modes = MODES if args.mode == "both" else (args.mode,)
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "source": args.source,
+        "host": {
+            "hostname": platform.node(),
+            "machine": platform.machine(),
+            "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version()
+        },
+        "runs": run_modes(args, modes)
+    }
+    for run in report["runs"].values():
+        print_run(run)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n报告已写入: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
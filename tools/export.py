@@ -1,7 +1,280 @@
-from ultralytics import YOLO
+"""
+模型导出与性能测试工具
+把 models/ 中的模型导出为指定的格式、精度和输入尺寸，在本机上用示例视频测试每个导出结果的
+推理延迟和吞吐量，并在模型旁写入元数据文件（<模型文件名>.meta.json）：类别、输入尺寸、精度和实测性能。
+/api/models 会返回这些元数据，方便按本机的实测数据选择模型。
 
-# Load the YOLO26 model
-model = YOLO("yolo26m.pt")
+导出的模型按 <原模型名>_<imgsz>[_fp16|_int8]<格式后缀> 命名，例如 yolo26m_640_int8_openvino_model。
 
-# Export the model to TensorRT format
-model.export(format="engine",int8=True) 
\ No newline at end of file
+用法：
+    # 导出为 ONNX 和 OpenVINO（640 / 480 两种输入尺寸，OpenVINO 额外导出 int8），并用示例视频测试
+    python tools/export.py yolo26m.pt --formats onnx openvino --imgsz 640 480 --precision fp32 int8 --sample videos/demo.mp4
+
+    # 导出为 TensorRT int8 引擎（需要GPU）
+    python tools/export.py yolo26m.pt --formats engine --imgsz 640 --precision int8 --device 0
+
+    # 只测试已有模型并更新元数据
+    python tools/export.py yolo26m_640_int8.engine yolo26m.pt --benchmark-only --device 0 --sample videos/demo.mp4
+"""
+import argparse
+import os
+import platform
+import shutil
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(BASE_DIR, 'models')
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from cpu_backends import detect_model_format, load_model_metadata, save_model_metadata, OPENVINO_DIR_SUFFIX  # noqa: E402
+
+# 导出格式：{ultralytics 格式名: (文件名后缀, 支持的精度)}
+EXPORT_FORMATS = {
+    "onnx": (".onnx", ("fp32", "fp16")),
+    "openvino": (OPENVINO_DIR_SUFFIX, ("fp32", "fp16", "int8")),
+    "torchscript": (".torchscript", ("fp32", "fp16")),
+    "engine": (".engine", ("fp32", "fp16", "int8")),
+}
+GPU_ONLY_FP16 = ("onnx", "torchscript")  # 这些格式的 fp16 导出需要GPU
+# ultralytics 导出时在原模型旁生成的文件（<原模型名><后缀>）：导出结果、TensorRT 的中间 ONNX、int8 校准缓存等
+EXPORT_ARTIFACT_SUFFIXES = (".onnx", ".engine", ".torchscript", ".cache", OPENVINO_DIR_SUFFIX,
+                            "_int8" + OPENVINO_DIR_SUFFIX)
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov')
+
+
+def resolve_model(name):
+    """模型名称解析为路径（优先 models/ 目录）"""
+    for path in (os.path.join(MODELS_DIR, name), name):
+        if os.path.exists(path):
+            return os.path.abspath(path)
+    raise FileNotFoundError(f"模型不存在: {name}")
+
+
+def model_stem(path):
+    """去掉格式后缀的模型名，例如 yolo26m.pt -> yolo26m"""
+    name = os.path.basename(os.path.normpath(path))
+    if name.endswith(OPENVINO_DIR_SUFFIX):
+        return name[:-len(OPENVINO_DIR_SUFFIX)]
+    return os.path.splitext(name)[0]
+
+
+def export_model(source_path, export_format, imgsz, precision, device, data=None):
+    """导出一个模型，结果移动到 models/ 并按尺寸和精度命名，返回导出后的路径和类别名称"""
+    from ultralytics import YOLO
+
+    suffix = EXPORT_FORMATS[export_format][0]
+    precision_tag = "" if precision == "fp32" else f"_{precision}"
+    target = os.path.join(MODELS_DIR, f"{model_stem(source_path)}_{imgsz}{precision_tag}{suffix}")
+
+    # ultralytics 把导出结果（以及 TensorRT 的中间 ONNX、int8 校准缓存等）写到原模型所在目录，
+    # 只清理由原模型名派生、导出前不存在的文件（同一目录中服务或其他导出写入的文件不受影响）
+    source_stem = os.path.splitext(source_path)[0]
+    artifacts = [source_stem + suffix for suffix in EXPORT_ARTIFACT_SUFFIXES]
+    preexisting = {path for path in artifacts if os.path.exists(path)}
+    kwargs = {"format": export_format, "imgsz": imgsz, "half": precision == "fp16",
+              "int8": precision == "int8", "device": device}
+    if data and precision == "int8":
+        kwargs["data"] = data
+    model = YOLO(source_path)
+    exported = os.path.abspath(str(model.export(**kwargs)))
+
+    if exported != target:
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        shutil.move(exported, target)
+    # 清理导出过程中新产生的中间文件
+    for path in artifacts:
+        if path in preexisting or path == target or not os.path.exists(path):
+            continue
+        print(f"  删除中间文件: {os.path.basename(path)}")
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    return target, model.names
+
+
+def load_sample_frames(sample, count):
+    """从示例视频（或目录中的第一个视频）读取测试帧，没有示例视频时使用1080p随机噪声帧"""
+    if sample and os.path.isdir(sample):
+        videos = sorted(name for name in os.listdir(sample) if name.lower().endswith(VIDEO_EXTENSIONS))
+        if not videos:
+            raise FileNotFoundError(f"目录中没有视频文件: {sample}")
+        sample = os.path.join(sample, videos[0])
+
+    if not sample:
+        print("未指定示例视频，使用随机噪声帧测试（延迟与真实画面接近，但检测数量不同）")
+        rng = np.random.default_rng(0)
+        noise = [rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8) for _ in range(10)]
+        return [noise[i % len(noise)] for i in range(count)], None
+
+    cap = cv2.VideoCapture(sample)
+    frames = []
+    while len(frames) < count:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise RuntimeError(f"无法读取示例视频: {sample}")
+    return frames, os.path.basename(sample)
+
+
+def benchmark_model(model_path, frames, device, imgsz=None, warmup=5):
+    """逐帧推理测试模型，返回延迟分位数、吞吐量和各阶段平均耗时"""
+    from ultralytics import YOLO
+
+    model = YOLO(model_path, task="detect")
+    kwargs = {"device": device, "classes": [0], "verbose": False}
+    if imgsz:
+        kwargs["imgsz"] = imgsz
+    for frame in frames[:warmup]:
+        model.predict([frame], **kwargs)
+
+    latencies = []
+    speeds = {"preprocess": [], "inference": [], "postprocess": []}
+    start = time.perf_counter()
+    for frame in frames:
+        begin = time.perf_counter()
+        results = model.predict([frame], **kwargs)
+        latencies.append((time.perf_counter() - begin) * 1000)
+        for key in speeds:
+            speeds[key].append(results[0].speed.get(key) or 0.0)
+    total = time.perf_counter() - start
+
+    return {
+        "device": str(device),
+        "imgsz": imgsz,
+        "frames": len(frames),
+        "latency_ms": {
+            "mean": round(float(np.mean(latencies)), 2),
+            "p50": round(float(np.percentile(latencies, 50)), 2),
+            "p95": round(float(np.percentile(latencies, 95)), 2),
+            "max": round(float(np.max(latencies)), 2)
+        },
+        "fps": round(len(frames) / total, 2),
+        "stage_ms": {key: round(float(np.mean(values)), 2) for key, values in speeds.items()}
+    }, model.names
+
+
+def host_info():
+    """测试机器信息（元数据只对同一类机器有参考意义）"""
+    info = {
+        "hostname": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version()
+    }
+    try:
+        import ultralytics
+        info["ultralytics"] = ultralytics.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def write_metadata(model_path, names, benchmark, sample, **export_info):
+    """写入（或更新）模型元数据，保留已有的导出信息"""
+    metadata = load_model_metadata(model_path) or {}
+    metadata.update({k: v for k, v in export_info.items() if v is not None})
+    metadata.update({
+        "model": os.path.basename(os.path.normpath(model_path)),
+        "format": detect_model_format(model_path),
+        "classes": {int(k): v for k, v in names.items()} if isinstance(names, dict) else list(names)
+    })
+    if benchmark is not None:
+        metadata["benchmark"] = dict(benchmark, sample=sample, host=host_info(),
+                                     measured_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    save_model_metadata(model_path, metadata)
+    print(f"  元数据已写入: {os.path.basename(os.path.normpath(model_path))}.meta.json")
+
+
+def print_benchmark(name, benchmark):
+    latency = benchmark["latency_ms"]
+    print(f"  {name}: {benchmark['fps']} FPS, 延迟 平均 {latency['mean']} ms / P50 {latency['p50']} ms / "
+          f"P95 {latency['p95']} ms")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="导出 models/ 中的模型并在本机测试推理性能")
+    parser.add_argument("models", nargs="+", help="模型文件名（models/ 目录中）或路径")
+    parser.add_argument("--formats", nargs="+", choices=list(EXPORT_FORMATS), default=["onnx"],
+                        help="导出格式（默认 onnx）")
+    parser.add_argument("--imgsz", nargs="+", type=int, default=None,
+                        help="推理输入尺寸，可指定多个（导出默认 640，只测试时默认使用模型自身的尺寸）")
+    parser.add_argument("--precision", nargs="+", choices=["fp32", "fp16", "int8"], default=["fp32"],
+                        help="精度，格式不支持的组合会跳过（默认 fp32）")
+    parser.add_argument("--device", default="cpu", help="导出和测试使用的设备（cpu 或 GPU 编号，默认 cpu）")
+    parser.add_argument("--data", default=None, help="int8 量化校准使用的数据集配置（默认使用 ultralytics 内置的示例数据集）")
+    parser.add_argument("--sample", default=None, help="测试使用的示例视频或视频目录（默认使用随机噪声帧）")
+    parser.add_argument("--frames", type=int, default=100, help="测试帧数（默认 100）")
+    parser.add_argument("--benchmark-only", action="store_true", help="不导出，只测试指定的模型并更新元数据")
+    parser.add_argument("--no-benchmark", action="store_true", help="只导出，不测试")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    frames, sample = (None, None) if args.no_benchmark else load_sample_frames(args.sample, args.frames)
+    failures = 0
+
+    for name in args.models:
+        try:
+            source_path = resolve_model(name)
+        except FileNotFoundError as e:
+            failures += 1
+            print(e)
+            continue
+        print(f"模型: {os.path.basename(source_path)}")
+
+        if args.benchmark_only:
+            imgsz = args.imgsz[0] if args.imgsz else None
+            try:
+                benchmark, names = benchmark_model(source_path, frames, args.device, imgsz)
+            except Exception as e:
+                failures += 1
+                print(f"  测试失败: {e}")
+                continue
+            print_benchmark(os.path.basename(source_path), benchmark)
+            write_metadata(source_path, names, benchmark, sample)
+            continue
+
+        for export_format in args.formats:
+            for imgsz in args.imgsz or [640]:
+                for precision in args.precision:
+                    if precision not in EXPORT_FORMATS[export_format][1]:
+                        print(f"  跳过 {export_format} {precision}：该格式不支持此精度")
+                        continue
+                    if precision == "fp16" and export_format in GPU_ONLY_FP16 and args.device == "cpu":
+                        print(f"  跳过 {export_format} fp16：需要在GPU上导出（--device 0）")
+                        continue
+                    print(f"  导出 {export_format} imgsz={imgsz} {precision} ...")
+                    try:
+                        target, names = export_model(source_path, export_format, imgsz, precision,
+                                                     args.device, args.data)
+                        benchmark = None if args.no_benchmark else \
+                            benchmark_model(target, frames, args.device, imgsz)[0]
+                    except Exception as e:
+                        failures += 1
+                        print(f"  导出或测试失败: {e}")
+                        continue
+                    if benchmark is not None:
+                        print_benchmark(os.path.basename(target), benchmark)
+                    write_metadata(target, names, benchmark, sample, source=os.path.basename(source_path),
+                                   imgsz=imgsz, precision=precision,
+                                   exported_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())